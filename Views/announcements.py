@@ -1,7 +1,25 @@
 import streamlit as st
 from datetime import datetime
+from google.cloud.firestore_v1.field_path import FieldPath
 from configs.firebase_config import get_firestore
+from services.announcement_feed import FEED_WINDOW_SIZE, get_announcement_feed
+from services.comments import FEED_FIELDS, build_comment, comment_ops, latest_comments, load_comments
+from services.data_cache import document_key, get_document_cache
+from services.html_cards import render_comments
+from services.images import pick_profile_pic_path
+from services.local_mirror import get_local_mirror
+from services.profiles import AVATAR_WIDTH, DEFAULT_AVATAR_URL, avatar_url, display_name, get_profile, get_profiles
+from services.signed_urls import get_signed_url_manager
+from services.single_flight import get_single_flight
+from services.write_queue import create_op, get_write_queue, queue_write
 import streamlit as st_cache_resource
+
+# How often a session checks the in-memory window for new posts
+FEED_REFRESH_SECONDS = 5
+
+# Older announcements are fetched this many at a time below the live window
+HISTORY_PAGE_SIZE = 10
+
 @st_cache_resource.cache_resource
 def get_cached_firestore():
     return get_firestore()
@@ -19,6 +37,7 @@ def show_announcements():
     # Announcement feed
     st.header("Latest Announcements")
     _render_announcement_feed(firestore_db)
+    _watch_feed(firestore_db)
 
 def _render_announcement_form(firestore_db):
     """Render the new announcement creation form"""
@@ -28,87 +47,281 @@ def _render_announcement_form(firestore_db):
             content = st.text_area("Content", height=150)
             submit_button = st.form_submit_button("Post Announcement")
 
-            # Autofill author name if possible
-            user = st.session_state.get('user')
-            author_name = ""
-            if user:
-                user_id = getattr(user, "uid", None)
-                if user_id:
-                    try:
-                        user_doc = firestore_db.collection("users").document(user_id).get()
-                        if user_doc.exists:
-                            user_data = user_doc.to_dict()
-                            first_name = user_data.get('first_name', '')
-                            last_name = user_data.get('last_name', '')
-                            author_name = f"{first_name} {last_name}".strip()
-                        if not author_name:
-                            first_name = getattr(user, 'first_name', '')
-                            last_name = getattr(user, 'last_name', '')
-                            author_name = f"{first_name} {last_name}".strip()
-                        if not author_name or author_name == " ":
-                            author_name = getattr(user, "email", "")
-                    except Exception:
-                        author_name = getattr(user, "email", "")
-            
             if submit_button:
                 if not title or not content:
                     st.warning("Please fill in both title and content")
                     return
                 
                 try:
+                    # Resolve the author name only when actually posting
+                    user = st.session_state.get('user')
+                    user_id = getattr(user, "uid", None)
+                    _, author_name = _get_user_profile_data(firestore_db, user_id, user)
                     announcement_data = {
                         "title": title,
                         "content": content,
                         "author": author_name,
+                        "author_uid": user_id,
                         "timestamp": datetime.now(),
-                        "comments": []
+                        "comment_count": 0,
+                        "latest_comments": {},
+                        "last_updated": datetime.now(),
                     }
-                    firestore_db.collection("announcements").add(announcement_data)
+                    # The id is generated here so a replayed write cannot post twice
+                    announcement_id = firestore_db.collection("announcements").document().id
+                    queue_write(
+                        [create_op(f"announcements/{announcement_id}", announcement_data)],
+                        "Posting announcement",
+                        key=f"announcements/{announcement_id}",
+                    )
                     st.success("Announcement posted successfully!")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error posting announcement: {e}")
 
+def _init_history_state():
+    """Initialize the session's pages of older announcements"""
+    if 'announcements_pages' not in st.session_state:
+        # pages of posts older than the live window, fetched this session
+        st.session_state.announcements_pages = []
+    if 'announcements_cursor' not in st.session_state:
+        # (timestamp, id) of the oldest post loaded so far
+        st.session_state.announcements_cursor = None
+    if 'announcements_has_more' not in st.session_state:
+        st.session_state.announcements_has_more = True
+    if 'announcements_window_tail' not in st.session_state:
+        # (timestamp, id) of the live window's oldest post when history was last joined to it
+        st.session_state.announcements_window_tail = None
+
+
+def _position(post):
+    """Return where a post sits in the feed, as (timestamp, id); None without a timestamp"""
+    timestamp = post.get('timestamp')
+    return None if timestamp is None else (timestamp, post['id'])
+
+
+def _fetch_posts_before(firestore_db, position, limit):
+    """Fetch up to ``limit`` announcements ordered before ``position``, newest first.
+
+    Posts are ordered by timestamp and then id, so posts sharing a
+    timestamp are neither skipped nor repeated across pages.
+    """
+    mirror = get_local_mirror()
+    if mirror.ready("announcements"):
+        return [
+            dict({field: post[field] for field in FEED_FIELDS if field in post}, id=announcement_id)
+            for announcement_id, post in mirror.before("announcements", position, limit)
+        ]
+
+    timestamp, announcement_id = position
+    query = firestore_db.collection("announcements")\
+                        .select(FEED_FIELDS)\
+                        .order_by("timestamp", direction="DESCENDING")\
+                        .order_by(FieldPath.document_id(), direction="DESCENDING")\
+                        .start_after({"timestamp": timestamp, FieldPath.document_id(): announcement_id})\
+                        .limit(limit)
+    # Sessions paging past the same post at once share one query; to_dict copies per caller
+    docs = get_single_flight().do(("announcements_before", position, limit), lambda: list(query.stream()))
+    document_cache = get_document_cache()
+    posts = []
+    for doc in docs:
+        document_cache.put(document_key("announcements", doc.id), doc.to_dict(), doc.update_time)
+        post = doc.to_dict()
+        post["id"] = doc.id
+        posts.append(post)
+    return posts
+
+
+def _load_older_page(firestore_db, window):
+    """Append the next page of history, starting below the oldest post shown"""
+    if st.session_state.announcements_cursor is None:
+        st.session_state.announcements_window_tail = _position(window[-1])
+    cursor = st.session_state.announcements_cursor or _position(window[-1])
+    if cursor is None:
+        st.session_state.announcements_has_more = False
+        return
+    posts = _fetch_posts_before(firestore_db, cursor, HISTORY_PAGE_SIZE)
+    if posts:
+        st.session_state.announcements_pages.append(posts)
+        st.session_state.announcements_cursor = _position(posts[-1])
+    st.session_state.announcements_has_more = len(posts) == HISTORY_PAGE_SIZE
+
+
+def _fill_history_gap(firestore_db, window):
+    """Fetch posts pushed out of the live window since history was loaded"""
+    pages = st.session_state.announcements_pages
+    joined_tail = st.session_state.announcements_window_tail
+    cursor = _position(window[-1]) if window else None
+    newest_loaded = _position(pages[0][0]) if pages and pages[0] else None
+    if newest_loaded is None or joined_tail is None or cursor is None or cursor <= joined_tail:
+        return
+    st.session_state.announcements_window_tail = cursor
+    gap = []
+    while cursor > newest_loaded:
+        posts = _fetch_posts_before(firestore_db, cursor, HISTORY_PAGE_SIZE)
+        gap.extend(post for post in posts if (_position(post) or newest_loaded) > newest_loaded)
+        if len(posts) < HISTORY_PAGE_SIZE:
+            break
+        cursor = _position(posts[-1])
+    if gap:
+        pages.insert(0, gap)
+
+
+def _with_pending_writes(window):
+    """Show this process's queued announcement writes before they commit"""
+    queue = get_write_queue()
+    posts = []
+    for post in window:
+        post = queue.overlay(f"announcements/{post['id']}", post)
+        if post is not None:
+            posts.append(post)
+    window_ids = {post['id'] for post in posts}
+    created = [
+        dict(post, id=announcement_id)
+        for announcement_id, post in queue.pending_in("announcements").items()
+        if announcement_id not in window_ids
+    ]
+    created.sort(key=lambda post: post.get('timestamp') or datetime.min, reverse=True)
+    return created + posts
+
+
+def _feed_state(firestore_db):
+    """What the live part of the feed depends on: the window and this process's queued writes"""
+    return (
+        get_announcement_feed(firestore_db).current_version(),
+        get_write_queue().pending_writes("announcements"),
+    )
+
+
+@st.fragment(run_every=FEED_REFRESH_SECONDS)
+def _watch_feed(firestore_db):
+    """Re-render the page only once the feed changed since it was last rendered"""
+    # A fragment that returned early would clear its output, so the check runs apart from the feed
+    try:
+        changed = _feed_state(firestore_db) != st.session_state.get('announcements_rendered_state')
+    except Exception:
+        # The feed reports the error itself when it renders
+        return
+    if changed:
+        st.rerun()
+
+
+@st.fragment
 def _render_announcement_feed(firestore_db):
     """Render the list of announcements with comments"""
     try:
-        announcements = firestore_db.collection("announcements")\
-                                .order_by("timestamp", direction="DESCENDING")\
-                                .limit(10)\
-                                .stream()
-        
-        announcements_list = []
-        for announcement in announcements:
-            announcement_data = announcement.to_dict()
-            announcement_data["id"] = announcement.id
-            announcements_list.append(announcement_data)
-            
-        if not announcements_list:
+        st.session_state.announcements_rendered_state = _feed_state(firestore_db)
+        # Served from the process-wide listener window, no query per rerun
+        window = _with_pending_writes(get_announcement_feed(firestore_db).get_posts())
+
+        if not window:
             st.info("No announcements yet. Be the first to post!")
             return
-            
+
+        # Older pages stay in the session, only a shifted window costs a read
+        _init_history_state()
+        _fill_history_gap(firestore_db, window)
+        window_ids = {post['id'] for post in window}
+        announcements_list = window + [
+            post
+            for page in st.session_state.announcements_pages
+            for post in page
+            if post['id'] not in window_ids
+        ]
+
+        # Resolve every author shown on the page with a single batched lookup
+        author_ids = set()
+        for post in announcements_list:
+            author_ids.add(post.get('author_uid'))
+            author_ids.update(comment.get('author_uid') for comment in _visible_comments(post))
+        try:
+            profiles = get_profiles(firestore_db, author_ids)
+            # Sign every avatar on the page in one batch before rendering
+            get_signed_url_manager().get_urls(
+                pick_profile_pic_path(profile, AVATAR_WIDTH) for profile in profiles.values()
+            )
+        except Exception:
+            profiles = {}
+
         for post in announcements_list:
-            _render_single_announcement(firestore_db, post)
+            _render_single_announcement(firestore_db, post, profiles)
             st.markdown("---")
-            
+
+        if st.session_state.announcements_has_more and len(window) >= FEED_WINDOW_SIZE:
+            if st.button("Load older announcements", key="announcements_load_more"):
+                _load_older_page(firestore_db, window)
+                st.rerun(scope="fragment")
+        else:
+            st.caption("You've reached the first announcement.")
+
     except Exception as e:
         st.error(f"Error loading announcements: {e}")
 
-def _render_single_announcement(firestore_db, post):
+def _render_single_announcement(firestore_db, post, profiles):
     """Render a single announcement with its comments"""
+    author = post.get('author', 'Anonymous')
+    if post.get('author_uid') in profiles:
+        author = display_name(profiles[post['author_uid']], default=author)
     st.markdown(f"### {post.get('title', 'No title')}")
     st.caption(
-        f"Posted by {post.get('author', 'Anonymous')} • "
+        f"Posted by {author} • "
         f"{post.get('timestamp').strftime('%b %d, %Y %H:%M') if post.get('timestamp') else ''}"
     )
     st.markdown(f"> {post.get('content', '')}")
     
-    # Comments section
-    with st.expander(f"💬 Comments ({len(post.get('comments', []))})"):
+    # Comments section, the full thread is only read when asked for
+    count = _comment_count(post)
+    with st.expander(f"💬 Comments ({count})" if count is not None else "💬 Comments"):
         if st.session_state.get('is_authenticated', False):
             _render_comment_form(firestore_db, post)
-        
-        _render_comments_list(post.get('comments', []))
+
+        shown = _visible_comments(post)
+        _render_comments_list(shown, profiles)
+        thread = _loaded_thread(post)
+        if thread is None and (count is None or count > len(shown)):
+            label = f"Show all {count} comments" if count is not None else "Show comments"
+            if st.button(label, key=f"comments_load_{post['id']}"):
+                _load_thread(firestore_db, post)
+                st.rerun(scope="fragment")
+
+def _is_legacy(post):
+    """Whether a post still embeds its comments; new comments on it are counted separately"""
+    return 'comments' in post
+
+
+def _comment_count(post):
+    """Number of comments on a post, None when the post carries neither count nor comments"""
+    if _is_legacy(post):
+        return len(post['comments']) + post.get('comment_count', 0)
+    return post.get('comment_count')
+
+def _loaded_thread(post):
+    """The full thread loaded this session, unless comments were added since"""
+    entry = st.session_state.get('announcement_threads', {}).get(post['id'])
+    if entry is None:
+        return None
+    loaded_count, comments = entry
+    return comments if loaded_count == _comment_count(post) else None
+
+def _load_thread(firestore_db, post):
+    """Read a post's full comment thread into the session"""
+    if 'announcement_threads' not in st.session_state:
+        # announcement id -> (comment count when loaded, comments)
+        st.session_state.announcement_threads = {}
+    comments = load_comments(firestore_db, post['id'], legacy=_is_legacy(post))
+    st.session_state.announcement_threads[post['id']] = (_comment_count(post), comments)
+
+def _visible_comments(post):
+    """The loaded thread if there is one, otherwise the preview on the post"""
+    thread = _loaded_thread(post)
+    if thread is not None:
+        return thread
+    if _is_legacy(post):
+        # Comments added since the post was written sit in the thread, previewed like any other
+        embedded_ids = {comment.get('id') for comment in post['comments']}
+        newer = [comment for comment in latest_comments(post) if comment.get('id') not in embedded_ids]
+        return post['comments'] + newer
+    return latest_comments(post)
 
 def _render_comment_form(firestore_db, post):
     """Render the form to add a new comment"""
@@ -122,70 +335,57 @@ def _render_comment_form(firestore_db, post):
                 # Get user profile data
                 profile_pic_url, author_name = _get_user_profile_data(firestore_db, user_id, user)
                 
-                # Create new comment
-                new_comment = {
-                    "text": comment_text,
-                    "author": author_name,
-                    "timestamp": datetime.now(),
-                    "author_pic": profile_pic_url
-                }
-                
-                # Update comments in Firestore
-                doc_ref = firestore_db.collection("announcements").document(post['id'])
-                current_comments = doc_ref.get().to_dict().get('comments', [])
-                current_comments.append(new_comment)
-                doc_ref.update({"comments": current_comments})
+                # Queue the comment, it is shown from the queue until it commits
+                new_comment = build_comment(comment_text, author_name, profile_pic_url, author_uid=user_id)
+                queue_write(
+                    comment_ops(post['id'], new_comment, latest=latest_comments(post)),
+                    "Posting comment",
+                    key=f"announcements/{post['id']}/comments/{new_comment['id']}",
+                    actions=[("invalidate_documents", [document_key("announcements", post['id'])])],
+                )
+                _remember_comment(post['id'], new_comment)
+                st.session_state.get('announcement_threads', {}).pop(post['id'], None)
                 st.rerun()
                 
             except Exception as e:
                 st.error(f"Error adding comment: {e}")
 
+def _remember_comment(announcement_id, comment):
+    """Show a new comment on a post held in this session's history pages"""
+    for page in st.session_state.get('announcements_pages', []):
+        for post in page:
+            if post['id'] == announcement_id:
+                post['comment_count'] = post.get('comment_count', 0) + 1
+                post.setdefault('latest_comments', {})[comment['id']] = comment
+                return
+
 def _get_user_profile_data(firestore_db, user_id, user):
-    """Get user profile picture and display name"""
-    # Default values
-    profile_pic_url = 'https://ui-avatars.com/api/?name=User&background=random'
-    author_name = "Anonymous"
-    
+    """Get user profile picture (blob path or url) and display name"""
     if not user_id:
-        return profile_pic_url, author_name
-    
+        return DEFAULT_AVATAR_URL, "Anonymous"
+
     try:
-        # Try to get from Firestore user document
-        user_doc = firestore_db.collection("users").document(user_id).get()
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            profile_pic_url = user_data.get('profile_pic_url', profile_pic_url)
-            
-            # Get name from Firestore
-            first_name = user_data.get('first_name', '')
-            last_name = user_data.get('last_name', '')
-            author_name = f"{first_name} {last_name}".strip()
-            
-            # Fallback to auth user if no name in Firestore
-            if not author_name:
-                first_name = getattr(user, 'first_name', '')
-                last_name = getattr(user, 'last_name', '')
-                author_name = f"{first_name} {last_name}".strip()
+        profile = get_profile(firestore_db, user_id)
     except Exception:
-        pass
-    
-    # Final fallback to email if no name found
-    if not author_name or author_name == " ":
-        author_name = getattr(user, "email", "Anonymous")
-    
-    return profile_pic_url, author_name
+        profile = {}
+
+    # Store the blob path rather than a short-lived signed url
+    profile_pic = pick_profile_pic_path(profile, AVATAR_WIDTH) or avatar_url(profile)
+    return profile_pic, display_name(profile, user)
 
-def _render_comments_list(comments):
-    """Render the list of comments for an announcement"""
+def _render_comments_list(comments, profiles):
+    """Render the list of comments for an announcement as a single HTML block"""
+    if not comments:
+        return
+    rows = []
     for comment in comments:
-        col1, col2 = st.columns([1, 16])
-        with col1:
-            author_pic = comment.get('author_pic', f"https://ui-avatars.com/api/?name={comment.get('author', '')}")
-            st.image(author_pic, width=50)
-        with col2:
-            st.text(f"{comment.get('author', 'Anonymous')}: {comment.get('text', '')}")
-            timestamp = comment.get('timestamp')
-            if hasattr(timestamp, 'strftime'):
-                st.caption(timestamp.strftime('%b %d, %Y %H:%M'))
-            elif isinstance(timestamp, str):
-                st.caption(timestamp)
+        author = comment.get('author', 'Anonymous')
+        author_pic = comment.get('author_pic', f"https://ui-avatars.com/api/?name={author}")
+        profile = profiles.get(comment.get('author_uid'))
+        if profile:
+            author = display_name(profile, default=author)
+            author_pic = avatar_url(profile, default=None) or author_pic
+        if author_pic and "://" not in author_pic:
+            author_pic = get_signed_url_manager().get_url(author_pic)
+        rows.append((comment, author, author_pic))
+    render_comments(rows)
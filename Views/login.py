@@ -1,11 +1,14 @@
 import streamlit as st
 from firebase_admin import auth as firebase_auth
 from configs.firebase_config import get_auth
+from services.sessions import SignInError, sessions_enabled, start_session
 
 def show_login():
     auth = get_auth()
     
     st.title("Login")
+    if st.session_state.get('login_notice'):
+        st.success(st.session_state.pop('login_notice'))
     st.write("Welcome back! Please enter your credentials.")
     
     login_email = st.text_input("Email")
@@ -15,13 +18,18 @@ def show_login():
     with col1:
         if st.button("Login"):
             try:
-                # In a real app, you would use Firebase Auth SDK to sign in
-                # This is simplified for demonstration
-                user = firebase_auth.get_user_by_email(login_email)
-                st.session_state.user = user
-                st.session_state.is_authenticated = True
+                if sessions_enabled():
+                    # Checks the password and keeps the session in a cookie
+                    user = start_session(auth, login_email, login_password)
+                else:
+                    # Without a web API key there is no password check, look the user up only
+                    user = auth.get_user_by_email(login_email)
+                    st.session_state.user = user
+                    st.session_state.is_authenticated = True
                 st.success(f"Welcome back, {user.email}!")
                 st.rerun()  # This will refresh the page
+            except SignInError:
+                st.error("Invalid email or password.")
             except firebase_auth.UserNotFoundError:
                 st.error("User not found. Please check your email or sign up.")
             except Exception as e:
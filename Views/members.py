@@ -1,73 +1,333 @@
+import os
+import pandas as pd
 import streamlit as st
+from google.cloud.firestore_v1.field_path import FieldPath
 from configs.firebase_config import get_firestore
+from services.html_cards import render_member_cards
+from services.images import pick_profile_pic, pick_profile_pic_path
+from services.local_mirror import get_local_mirror
+from services.member_export import EXPORT_FORMATS, export_members
+from services.member_index import get_member_index
+from services.signed_urls import get_signed_url_manager
+from services.single_flight import get_single_flight
+
+MEMBERS_PAGE_SIZE = 20
+MEMBER_PIC_WIDTH = 100
+
+# Table mode sends rows to the grid in chunks, the grid only draws visible rows
+MEMBERS_TABLE_CHUNK = 5000
+MEMBERS_TABLE_HEIGHT = 600
+
+MEMBERS_TABLE_COLUMNS = {
+    "name": "Name",
+    "role": "Role",
+    "position": "Position",
+    "company": "Company",
+    "email": "Email",
+    "phone": "Phone",
+    "city": "City",
+    "country": "Country",
+    "skills": "Skills",
+}
+
+# Only the fields rendered on a member card are requested from Firestore
+MEMBER_CARD_FIELDS = [
+    "first_name",
+    "last_name",
+    "profile_pic_path",
+    "profile_pic_url",
+    "profile_pic_variants",
+    "role",
+    "email",
+    "position",
+    "company",
+    "phone",
+    "address.city",
+    "address.country",
+    "skills",
+    "bio",
+]
+
+
+def _init_members_state():
+    """Initialize pagination state for the members directory"""
+    if 'members_page' not in st.session_state:
+        st.session_state.members_page = 0
+    if 'members_pages' not in st.session_state:
+        # page index -> list of cards already fetched this session
+        st.session_state.members_pages = {}
+    if 'members_cursors' not in st.session_state:
+        # page index -> last document of that page, a snapshot or a mirror document id
+        st.session_state.members_cursors = {}
+    if 'members_has_next' not in st.session_state:
+        st.session_state.members_has_next = {}
+
+
+def _build_card(user_data, uid=None, version=None):
+    """Turn a projected user document into a member card"""
+    address = user_data.get("address", {})
+    # Blob paths are signed per page at render time, legacy urls are used as is
+    profile_pic_path = pick_profile_pic_path(user_data, MEMBER_PIC_WIDTH)
+    return {
+        # Identify the card's rendered HTML in the fragment cache
+        "id": uid,
+        "version": version,
+        "name": f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
+        "profile_pic_path": profile_pic_path,
+        "profile_pic": None if profile_pic_path else pick_profile_pic(user_data, MEMBER_PIC_WIDTH, default="images/default.jpg"),
+        "role": user_data.get("role", "user").capitalize(),
+        "email": user_data.get("email", "—"),
+        "position": user_data.get("position", "—"),
+        "company": user_data.get("company", "—"),
+        "phone": user_data.get("phone", "—"),
+        "city": address.get("city", "—"),
+        "country": address.get("country", "—"),
+        "skills": ", ".join(user_data.get("skills", [])),
+        "bio": user_data.get("bio", ""),
+    }
+
+
+def _fetch_members_page(firestore_db, page):
+    """Fetch a single page of member cards, reusing pages already loaded this session"""
+    if page in st.session_state.members_pages:
+        return st.session_state.members_pages[page]
+
+    cursor = None
+    if page > 0:
+        cursor = st.session_state.members_cursors.get(page - 1)
+        if cursor is None:
+            # Cursor for the previous page is unknown, walk back to it first
+            _fetch_members_page(firestore_db, page - 1)
+            cursor = st.session_state.members_cursors.get(page - 1)
+        if cursor is None:
+            return []
+
+    mirror = get_local_mirror()
+    # Fetch one extra document to know whether a next page exists
+    if mirror.ready("users"):
+        # An indexed seek into the local replica, the cursor is a document id
+        docs = list(mirror.documents("users", after_id=getattr(cursor, "id", cursor), limit=MEMBERS_PAGE_SIZE + 1))
+        cards = [_build_card(data, uid, update_time) for uid, data, update_time in docs[:MEMBERS_PAGE_SIZE]]
+        last = cards[-1]["id"] if cards else None
+    else:
+        query = firestore_db.collection("users")\
+                            .select(MEMBER_CARD_FIELDS)\
+                            .order_by(FieldPath.document_id())
+        if cursor is not None:
+            query = query.start_after(cursor)
+        # Sessions asking for the same page at once share one query
+        docs = get_single_flight().do(
+            ("members_page", getattr(cursor, "id", None)),
+            lambda: list(query.limit(MEMBERS_PAGE_SIZE + 1).stream()),
+        )
+        cards = [_build_card(doc.to_dict(), doc.id, doc.update_time) for doc in docs[:MEMBERS_PAGE_SIZE]]
+        last = docs[:MEMBERS_PAGE_SIZE][-1] if cards else None
+
+    st.session_state.members_pages[page] = cards
+    st.session_state.members_has_next[page] = len(docs) > MEMBERS_PAGE_SIZE
+    if last is not None:
+        st.session_state.members_cursors[page] = last
+    return cards
+
+
+def _render_member_cards(user_cards):
+    """Render a page of member cards as a single HTML block"""
+    # Sign every picture on the page in one batch
+    signed_urls = get_signed_url_manager().get_urls(card["profile_pic_path"] for card in user_cards)
+    pictures = [
+        signed_urls.get(card["profile_pic_path"]) or card["profile_pic"] or "images/default.jpg"
+        for card in user_cards
+    ]
+    render_member_cards(user_cards, pictures)
+
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _members_frame(_index, version):
+    """One row per indexed member in display order, rebuilt when the index changes"""
+    uids = _index.all()[:]
+    rows = []
+    for uid in uids:
+        user_data = _index.get(uid)
+        address = user_data.get("address", {})
+        rows.append((
+            f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip(),
+            user_data.get("role", "user").capitalize(),
+            user_data.get("position", ""),
+            user_data.get("company", ""),
+            user_data.get("email", ""),
+            user_data.get("phone", ""),
+            address.get("city", ""),
+            address.get("country", ""),
+            ", ".join(user_data.get("skills", [])),
+        ))
+    return pd.DataFrame(rows, index=pd.Index(uids, name="uid"), columns=list(MEMBERS_TABLE_COLUMNS))
+
+
+def _render_members_table(firestore_db, search_query):
+    """Render members as a virtualized grid with client-side sort and filter"""
+    from st_aggrid import AgGrid, GridOptionsBuilder
+
+    index = get_member_index(firestore_db, MEMBER_CARD_FIELDS)
+    frame = _members_frame(index, index.version)
+    results = index.search(search_query) if search_query.strip() else index.all()
+    if not results:
+        st.info("No members match your search.")
+        return
+
+    # Start from one chunk whenever the query changes
+    if st.session_state.get('members_table_query') != search_query:
+        st.session_state.members_table_query = search_query
+        st.session_state.members_table_rows = MEMBERS_TABLE_CHUNK
+    row_limit = st.session_state.members_table_rows
+
+    uids = [uid for uid in results[:row_limit] if uid in frame.index]
+    table = frame.loc[uids].reset_index(drop=True)
+
+    builder = GridOptionsBuilder.from_dataframe(table)
+    builder.configure_default_column(sortable=True, filter=True, resizable=True)
+    for column, header in MEMBERS_TABLE_COLUMNS.items():
+        builder.configure_column(column, header_name=header)
+    builder.configure_grid_options(rowBuffer=20, animateRows=False)
+    AgGrid(
+        table,
+        gridOptions=builder.build(),
+        height=MEMBERS_TABLE_HEIGHT,
+        # Sorting and filtering stay in the browser instead of rerunning the script
+        update_on=[],
+        data_return_mode="MINIMAL",
+        show_download_button=False,
+        key="members_table",
+    )
+
+    st.caption(f"Showing {len(table)} of {len(results)} members")
+    if len(results) > row_limit:
+        if st.button("Load more rows", key="members_table_more"):
+            st.session_state.members_table_rows = row_limit + MEMBERS_TABLE_CHUNK
+            st.rerun()
+
+
+def _render_search_results(firestore_db, search_query):
+    """Render members matching a search, served from the in-memory index"""
+    index = get_member_index(firestore_db, MEMBER_CARD_FIELDS)
+    results = index.search(search_query)
+    if not results:
+        st.info("No members match your search.")
+        return
+
+    # Start from the first page whenever the query changes
+    if st.session_state.get('members_search_last') != search_query:
+        st.session_state.members_search_last = search_query
+        st.session_state.members_search_page = 0
+    page = st.session_state.members_search_page
+    page_count = (len(results) + MEMBERS_PAGE_SIZE - 1) // MEMBERS_PAGE_SIZE
+    page = min(page, page_count - 1)
+
+    st.caption(f"{len(results)} member{'s' if len(results) != 1 else ''} found")
+    page_results = results[page * MEMBERS_PAGE_SIZE:(page + 1) * MEMBERS_PAGE_SIZE]
+    _render_member_cards([_build_card(index.get(uid), uid, index.version_of(uid)) for uid in page_results])
+
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        if st.button("⬅️ Previous", key="members_search_prev", disabled=page == 0):
+            st.session_state.members_search_page = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page + 1} of {page_count}")
+    with col3:
+        if st.button("Next ➡️", key="members_search_next", disabled=page >= page_count - 1):
+            st.session_state.members_search_page = page + 1
+            st.rerun()
+
+
+def _render_pagination(page):
+    """Render Previous/Next page navigation"""
+    has_next = st.session_state.members_has_next.get(page, False)
+    col1, col2, col3 = st.columns([1, 4, 1])
+    with col1:
+        if st.button("⬅️ Previous", key="members_prev", disabled=page == 0):
+            st.session_state.members_page = page - 1
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page + 1}")
+    with col3:
+        if st.button("Next ➡️", key="members_next", disabled=not has_next):
+            st.session_state.members_page = page + 1
+            st.rerun()
+
+
+def _render_export(firestore_db):
+    """Let members download the directory as CSV or Excel"""
+    with st.expander("📥 Export members"):
+        export_format = st.radio("Format", list(EXPORT_FORMATS), key="members_export_format", horizontal=True)
+        if st.button("Prepare export", key="members_export_prepare"):
+            previous = st.session_state.pop('members_export', None)
+            if previous and os.path.exists(previous["path"]):
+                os.remove(previous["path"])
+            with st.spinner("Exporting members..."):
+                path, row_count, seconds = export_members(firestore_db, export_format)
+            st.session_state.members_export = {
+                "path": path,
+                "format": export_format,
+                "rows": row_count,
+                "seconds": seconds,
+            }
+
+        export = st.session_state.get('members_export')
+        if export and os.path.exists(export["path"]):
+            extension, mime = EXPORT_FORMATS[export["format"]]
+            st.caption(f"{export['rows']} members exported in {export['seconds']:.1f}s")
+            with open(export["path"], "rb") as f:
+                st.download_button(
+                    f"Download {export['format']}",
+                    f,
+                    file_name=f"members.{extension}",
+                    mime=mime,
+                    key="members_export_download",
+                )
+
 
 def show_members():
     st.title("👥 Our Members")
 
     firestore_db = get_firestore()
+    _init_members_state()
+
+    if st.button("🔄 Refresh", key="members_refresh"):
+        st.session_state.members_page = 0
+        st.session_state.members_pages = {}
+        st.session_state.members_cursors = {}
+        st.session_state.members_has_next = {}
+        st.rerun()
+
+    search_query = st.text_input(
+        "🔍 Search members",
+        key="members_search",
+        placeholder="e.g. SQL Manila, or skills:python city:cebu",
+    )
+    view_mode = st.radio("View", ["Cards", "Table"], key="members_view", horizontal=True)
+    _render_export(firestore_db)
 
     try:
-        users_ref = firestore_db.collection("users")
-        users = users_ref.stream()
-
-        user_cards = []
-
-        for user_doc in users:
-            user_data = user_doc.to_dict()
-            profile_pic = user_data.get("profile_pic_url") or "images/default.jpg"
-            name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
-            role = user_data.get("role", "user").capitalize()
-            email = user_data.get("email", "—")
-            position = user_data.get("position", "—")
-            company = user_data.get("company", "—")
-            phone = user_data.get("phone", "—")
-            address = user_data.get("address", {})
-            city = address.get("city", "—")
-            country = address.get("country", "—")
-            skills = ", ".join(user_data.get("skills", []))
-            bio = user_data.get("bio", "")
-
-            card = {
-                "name": name,
-                "profile_pic": profile_pic,
-                "role": role,
-                "email": email,
-                "position": position,
-                "company": company,
-                "phone": phone,
-                "city": city,
-                "country": country,
-                "skills": skills,
-                "bio": bio
-            }
+        if view_mode == "Table":
+            _render_members_table(firestore_db, search_query)
+            return
+
+        if search_query.strip():
+            _render_search_results(firestore_db, search_query)
+            return
 
-            user_cards.append(card)
+        page = st.session_state.members_page
+        user_cards = _fetch_members_page(firestore_db, page)
 
         if not user_cards:
+            if page > 0:
+                st.session_state.members_page = 0
+                st.rerun()
             st.info("No members found.")
             return
 
-        # Single column display
-        for card in user_cards:
-            with st.container():
-                cols = st.columns([1, 5])  # image | details
-                with cols[0]:
-                    try:
-                        st.image(card["profile_pic"], width=100)
-                    except Exception:
-                        st.image("images/default.jpg", width=100)
-
-                with cols[1]:
-                    st.markdown(f"### {card['name']}")
-                    st.markdown(f"**{card['role']}** — {card['position']} at {card['company']}")
-                    st.markdown(f"📧 **Email:** {card['email']}")
-                    st.markdown(f"📞 **Phone:** {card['phone']}")
-                    st.markdown(f"🌍 **Location:** {card['city']}, {card['country']}")
-                    if card["skills"]:
-                        st.markdown(f"🛠️ **Skills:** {card['skills']}")
-                    if card["bio"]:
-                        st.markdown(f"📝 **Bio:** {card['bio'][:200]}{'...' if len(card['bio']) > 200 else ''}")
-                st.markdown("---")
+        _render_member_cards(user_cards)
+        _render_pagination(page)
 
     except Exception as e:
         st.error(f"Failed to load members: {e}")
@@ -1,14 +1,13 @@
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import datetime
+from firebase_admin import firestore
 from configs.firebase_config import get_firestore, get_storage
-import uuid
-
-
-@st.cache_data(show_spinner=False)
-def get_user_data(_firestore_db, user_id):
-    doc_ref = _firestore_db.collection("users").document(user_id)
-    doc = doc_ref.get()
-    return doc.to_dict() if doc.exists else {}
+from services.data_cache import document_key
+from services.image_cache import cached_image_src
+from services.images import PROFILE_PIC_SIZES, pick_profile_pic, profile_pic_paths, upload_profile_pic_variants
+from services.member_index import index_member
+from services.profiles import DEFAULT_AVATAR_URL, get_profile, invalidate_profile
+from services.write_queue import queue_write, set_op
 
 
 def show_profile():
@@ -26,16 +25,16 @@ def show_profile():
     user_id = st.session_state.user.uid
 
     try:
-        user_data = get_user_data(firestore_db, user_id)
+        user_data = get_profile(firestore_db, user_id)
     except Exception as e:
         st.error(f"Error loading profile: {e}")
         user_data = {}
 
-    profile_pic_url = user_data.get('profile_pic_url', 'https://ui-avatars.com/api/?name=User&background=random')
+    profile_pic_url = pick_profile_pic(user_data, 300, default=DEFAULT_AVATAR_URL)
     st.markdown(
         f"""
         <div style="display: flex; justify-content: center;">
-            <img src="{profile_pic_url}" 
+            <img src="{cached_image_src(profile_pic_url)}" 
                  style="border-radius: 50%; object-fit: cover; width: 300px; height: 300px; max-width: 90vw;" 
                  alt="Profile Picture"/>
         </div>
@@ -86,20 +85,6 @@ def show_profile():
 
             if submitted:
                 try:
-                    new_profile_pic_url = profile_pic_url
-                    if new_profile_pic:
-                        if profile_pic_url and "profile_pics" in profile_pic_url:
-                            try:
-                                old_blob_name = profile_pic_url.split('/')[-1].split('?')[0]
-                                old_blob = storage_bucket.blob(old_blob_name)
-                                if old_blob.exists():
-                                    old_blob.delete()
-                            except Exception as e:
-                                print(f"Could not delete old pic: {e}")
-                        blob = storage_bucket.blob(f"profile_pics/{user_id}_{uuid.uuid4()}")
-                        blob.upload_from_file(new_profile_pic, content_type=new_profile_pic.type)
-                        new_profile_pic_url = blob.generate_signed_url(timedelta(days=365), method='GET')
-
                     updated_data = {
                         'email': user_email,
                         'first_name': first_name,
@@ -114,15 +99,39 @@ def show_profile():
                             'zip_code': zip_code,
                             'country': country
                         },
-                        'profile_pic_url': new_profile_pic_url,
                         'skills': [s.strip() for s in skills.split(',')] if skills else [],
                         'bio': bio,
                         'last_updated': datetime.now()
                     }
 
-                    doc_ref = firestore_db.collection("users").document(user_id)
-                    doc_ref.set(updated_data, merge=True)
-                    st.cache_data.clear()
+                    old_pic_paths = set()
+                    if new_profile_pic:
+                        old_pic_paths = profile_pic_paths(user_data)
+                        new_variants = upload_profile_pic_variants(storage_bucket, user_id, new_profile_pic)
+                        updated_data['profile_pic_path'] = new_variants[str(max(PROFILE_PIC_SIZES))]
+                        updated_data['profile_pic_variants'] = new_variants
+                        # Drop the permanently signed url left by older uploads
+                        updated_data['profile_pic_url'] = firestore.DELETE_FIELD
+                        # Re-uploading the current picture resolves to the same blobs
+                        old_pic_paths -= set(new_variants.values())
+
+                    actions = [
+                        ("refresh_mirrored", ["users", [user_id]]),
+                        ("invalidate_documents", [document_key("users", user_id)]),
+                    ]
+                    if old_pic_paths:
+                        # Stored with the write, so whichever process commits it removes the old picture
+                        actions.append(("delete_replaced_pictures", [user_id, sorted(old_pic_paths)]))
+                    queue_write(
+                        [set_op(f"users/{user_id}", updated_data, merge=True)],
+                        "Saving profile",
+                        actions=actions,
+                    )
+                    invalidate_profile(user_id)
+                    index_member(user_id, {
+                        key: value for key, value in updated_data.items()
+                        if value is not firestore.DELETE_FIELD
+                    })
                     st.success("✅ Profile updated!")
                     st.rerun()
 
@@ -1,8 +1,29 @@
 import streamlit as st
 from configs.firebase_config import get_auth, get_firestore, get_storage
+from services.images import PROFILE_PIC_SIZES, upload_profile_pic_variants
+from services.member_index import index_member
+from services.tasks import submit_task
 import datetime
-import uuid
-import time
+import io
+
+
+def _save_user_document(firestore_db, uid, user_data):
+    """Write the new user's profile document"""
+    firestore_db.collection("users").document(uid).set(user_data, merge=True)
+    index_member(uid, user_data)
+
+
+def _save_profile_picture(firestore_db, storage_bucket, uid, picture):
+    """Resize and upload the profile picture, then point the user document at it"""
+    profile_pic_variants = upload_profile_pic_variants(storage_bucket, uid, picture)
+    picture_fields = {
+        'profile_pic_path': profile_pic_variants[str(max(PROFILE_PIC_SIZES))],
+        'profile_pic_variants': profile_pic_variants,
+        'last_updated': datetime.datetime.now(),
+    }
+    firestore_db.collection("users").document(uid).set(picture_fields, merge=True)
+    index_member(uid, picture_fields)
+
 
 def show_signup():
     auth = get_auth()
@@ -60,13 +81,6 @@ def show_signup():
             user = auth.create_user(email=email, password=password)
             uid = user.uid
 
-            # Upload profile picture (optional)
-            profile_pic_url = ""
-            if profile_pic:
-                blob = storage_bucket.blob(f"profile_pics/{uid}_{uuid.uuid4()}")
-                blob.upload_from_file(profile_pic, content_type=profile_pic.type)
-                profile_pic_url = blob.generate_signed_url(datetime.timedelta(days=365), method='GET')
-
             # Firestore user document
             user_data = {
                 'email': email,
@@ -84,15 +98,20 @@ def show_signup():
                     'zip_code': zip_code,
                     'country': country
                 },
-                'profile_pic_url': profile_pic_url,
                 'skills': [skill.strip() for skill in skills.split(',')] if skills else [],
-                'bio': bio
+                'bio': bio,
+                'last_updated': datetime.datetime.now()
             }
 
-            firestore_db.collection("users").document(uid).set(user_data)
+            # Everything after the auth user exists runs in the background
+            submit_task("Saving your profile", _save_user_document, firestore_db, uid, user_data)
+            if profile_pic:
+                # Copy the upload, the widget buffer does not outlive this rerun
+                picture = io.BytesIO(profile_pic.getvalue())
+                submit_task("Uploading your profile picture", _save_profile_picture,
+                            firestore_db, storage_bucket, uid, picture)
 
-            st.success("🎉 Account created successfully! You can now log in.")
-            time.sleep(2)
+            st.session_state.login_notice = "🎉 Account created successfully! You can now log in."
             st.session_state.current_page = "Login"
             st.rerun()
 
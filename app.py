@@ -5,12 +5,10 @@ st.set_page_config(
     page_icon="🍺",
 )
 
-from Views.home import show_home
-from Views.login import show_login
-from Views.members import show_members
-from Views.signup import show_signup
-from Views.announcements import show_announcements
-from Views.profile import show_profile
+from services.instrumentation import metrics, render_debug_panel, start_configured_metrics_server
+from services.page_registry import render_page, render_startup_report
+from services.sessions import end_session, restore_session
+from services.tasks import render_job_status
 
 # Initialize session state
 if 'current_page' not in st.session_state:
@@ -22,8 +20,7 @@ if 'user' not in st.session_state:
 
 def logout():
     """Handle logout functionality"""
-    st.session_state.is_authenticated = False
-    st.session_state.user = None
+    end_session()
     st.session_state.current_page = "Login"
     st.rerun()
 
@@ -50,6 +47,15 @@ def main():
     </style>
     """, unsafe_allow_html=True)
 
+    metrics.begin_rerun()
+    start_configured_metrics_server()
+
+    # Verified locally from the session cookie, no Auth call per rerun
+    restore_session()
+
+    # Progress and failures of background work started on earlier reruns
+    render_job_status()
+
     if st.session_state.is_authenticated:
         # Sidebar navigation
         with st.sidebar:
@@ -85,24 +91,16 @@ def main():
                 logout()
 
         # Main content area - switch based on current_page
-        if st.session_state.current_page == "Home":
-            show_home()
-        elif st.session_state.current_page == "Announcements":
-            show_announcements()
-        elif st.session_state.current_page == "Profile":
-            show_profile()
-        elif st.session_state.current_page == "Members":
-            show_members()
+        if st.session_state.current_page in ("Home", "Announcements", "Profile", "Members"):
+            render_page(st.session_state.current_page)
         else:
             # Default to home if unknown page
             st.session_state.current_page = "Home"
             st.rerun()
     else:
         # Unauthenticated view - show login or signup
-        if st.session_state.current_page == "Login":
-            show_login()
-        elif st.session_state.current_page == "SignUp":
-            show_signup()
+        if st.session_state.current_page in ("Login", "SignUp"):
+            render_page(st.session_state.current_page)
         else:
             # Default to login if unknown page
             st.session_state.current_page = "Login"
@@ -110,3 +108,5 @@ def main():
 
 if __name__ == "__main__":
     main()
+    render_startup_report()
+    render_debug_panel()
@@ -0,0 +1,120 @@
+"""Throughput benchmark for the orphaned profile picture collector.
+
+Seeds the in-memory fakes with members whose three picture variants are
+referenced, legacy members referencing their picture only through a
+signed url, and orphaned pictures, some of them younger than the grace
+period, for ``--blobs`` blobs in total. One old orphan is the target of
+a save still in the write queue and one was just reused by an upload;
+both must survive. Runs a dry run and then a real collection per worker
+count, checks that exactly the other old orphans were deleted, and
+reports bytes reclaimed and deletes per second. Every fake backend
+call takes ``--latency`` seconds, like a network round trip:
+
+    python -m benchmarks.blob_gc --blobs 100000 --workers 8,32,64
+"""
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from benchmarks import fake_firebase
+from services.blob_gc import DEFAULT_GRACE, collect_orphaned_blobs
+from services.write_queue import WriteQueue, set_op
+
+VARIANT_SIZES = (64, 128, 320)
+# One shared payload keeps 100k fake blobs cheap while sizes stay realistic
+PICTURE_BYTES = bytes(12_000)
+
+
+def _signed_url(bucket, name):
+    return f"https://storage.googleapis.com/{bucket.name}/{name}?Expires=1767225600&GoogleAccessId=gc&Signature=c2ln"
+
+
+def seed(blobs, recent_share, queue_file):
+    """Fill fresh fakes; returns (firestore, bucket, counter, orphan names that must be deleted)"""
+    firestore_db, _, bucket, counter = fake_firebase.install(latency=0.0)
+    members = blobs // 2 // len(VARIANT_SIZES)
+    legacy_members = members // 10
+    firestore_db.seed("users", ((f"user{i:08d}", fake_firebase.make_user(i)) for i in range(members)))
+    firestore_db.seed("users", (
+        (f"legacy{i:08d}", {"profile_pic_url": _signed_url(bucket, f"profile_pics/legacy{i:08d}_{i:032x}")})
+        for i in range(legacy_members)
+    ))
+
+    now = datetime.now(timezone.utc)
+    old = now - DEFAULT_GRACE - timedelta(days=30)
+    referenced = [
+        (f"profile_pics/user{i:08d}_{size}.webp", PICTURE_BYTES, old)
+        for i in range(members) for size in VARIANT_SIZES
+    ] + [(f"profile_pics/legacy{i:08d}_{i:032x}", PICTURE_BYTES, old) for i in range(legacy_members)]
+    orphan_count = blobs - len(referenced)
+    recent = int(orphan_count * recent_share)
+    orphans = [
+        # Replaced pictures, and fresh uploads whose user document is not written yet
+        (f"profile_pics/user{i % members:08d}_{i:032x}_{VARIANT_SIZES[i % 3]}.webp", PICTURE_BYTES,
+         now if i < recent else old)
+        for i in range(orphan_count)
+    ]
+    bucket.seed(referenced + orphans)
+    expected = sorted(name for name, _, created in orphans if created == old)
+
+    # A member went back to an old picture; the save has not committed yet
+    queued = expected.pop()
+    queue = WriteQueue(queue_file, lambda: firestore_db)
+    queue.enqueue([set_op("users/user00000000", {"profile_pic_path": queued}, merge=True)], key="queued-save")
+    # And an upload resolved to an old picture, touching it
+    bucket.blob(expected.pop()).patch()
+    return firestore_db, bucket, counter, set(expected)
+
+
+def run_round(blobs, workers, dry_run, latency, recent_share):
+    with tempfile.TemporaryDirectory() as queue_dir:
+        queue_file = os.path.join(queue_dir, "write_queue.sqlite3")
+        firestore_db, bucket, counter, expected = seed(blobs, recent_share, queue_file)
+        before = set(bucket.blobs)
+        counter.reset()
+        counter.latency = latency
+        report = collect_orphaned_blobs(
+            firestore_db, bucket, workers=workers, dry_run=dry_run, queue_paths=[queue_file],
+        )
+    deleted = before - set(bucket.blobs)
+    fake_firebase.uninstall()
+    return dict(
+        report,
+        workers=workers,
+        blobs=blobs,
+        rpcs=counter.snapshot()["calls"],
+        correct=deleted == (set() if dry_run else expected) and report["orphans"] == len(expected),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blobs", type=int, default=100_000)
+    parser.add_argument("--workers", default="8,32,64", help="comma separated delete pool sizes")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds every backend call takes")
+    parser.add_argument("--recent-share", type=float, default=0.1, help="share of orphans inside the grace period")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rounds = [(0, True)] + [(int(w), False) for w in args.workers.split(",")]
+    results = []
+    for workers, dry_run in rounds:
+        result = run_round(args.blobs, workers or 1, dry_run, args.latency, args.recent_share)
+        results.append(result)
+        print(
+            f"{'dry-run' if dry_run else f'workers={workers}':<11} listed={result['listed']} "
+            f"orphans={result['orphans']} deleted={result['deleted']} "
+            f"reclaimed={result['bytes_reclaimed'] / 1e6:.1f}MB list={result['list_seconds']:.2f}s "
+            f"scan={result['scan_seconds']:.2f}s delete={result['delete_seconds']:.2f}s "
+            f"{result['deletes_per_second']} deletes/s correct={result['correct']}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Hit-rate benchmark for the document cache across server replicas.
+
+Splits a fixed stream of profile lookups, skewed towards popular members,
+across 1, 4 and 8 replica processes and runs it once per cache backend.
+Some lookups are profile saves that invalidate the member. Reports the
+cache hit rate, documents read from the backing store, and stale reads
+(a lookup returning an older version than the latest save). Lookups
+are spread over ``--duration`` seconds so invalidations have time to
+travel between processes:
+
+    python -m benchmarks.cache_replicas --replicas 1,4,8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from services.cache_backend import LocalBackend, SqliteBackend
+from services.data_cache import DocumentCache
+
+
+class _Snapshot:
+    def __init__(self, document_id, version):
+        self.id = document_id
+        self.exists = True
+        self.update_time = version
+        self._version = version
+
+    def to_dict(self):
+        return {"version": self._version}
+
+
+class SharedUsers:
+    """A users collection every replica process sees, holding a version per member"""
+
+    def __init__(self, versions):
+        self._versions = versions
+        self.documents_read = 0
+
+    def collection(self, collection_id):
+        return self
+
+    def document(self, document_id):
+        return document_id
+
+    def get_all(self, references):
+        references = list(references)
+        self.documents_read += len(references)
+        return [_Snapshot(uid, self._versions[int(uid)]) for uid in references]
+
+
+def _replica(backend_name, cache_path, versions, lookups, members, write_every, duration, seed, start, results):
+    backend = SqliteBackend(cache_path) if backend_name == "sqlite" else LocalBackend()
+    cache = DocumentCache(backend=backend)
+    users = SharedUsers(versions)
+    rng = random.Random(seed)
+    # Popularity falls off like a Zipf distribution
+    weights = [1 / (rank + 1) for rank in range(members)]
+    uids = rng.choices(range(members), weights=weights, k=lookups)
+
+    start.wait()
+    stale = 0
+    began = time.perf_counter()
+    for i, uid in enumerate(uids):
+        # Spread the lookups over the run like page views would be
+        delay = began + duration * i / lookups - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        if write_every and i % write_every == write_every - 1:
+            with versions.get_lock():
+                versions[uid] += 1
+            cache.invalidate(f"users/{uid}")
+            continue
+        profile = cache.get(users, "users", str(uid))
+        if profile.get("version", 0) < versions[uid]:
+            stale += 1
+    results.put({
+        **cache.get_stats(),
+        "documents_read": users.documents_read,
+        "stale_reads": stale,
+        "seconds": time.perf_counter() - began,
+    })
+
+
+def run_round(backend_name, replicas, lookups, members, write_every, duration, cache_dir):
+    """Run ``lookups`` split across ``replicas`` processes and sum their stats"""
+    cache_path = os.path.join(cache_dir, f"{backend_name}-{replicas}.sqlite3")
+    versions = multiprocessing.Array("i", members)
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_replica, args=(
+            backend_name, cache_path, versions, lookups // replicas, members, write_every, duration, seed, start,
+            results,
+        ))
+        for seed in range(replicas)
+    ]
+    for process in processes:
+        process.start()
+    start.set()
+    stats = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    hits = sum(s["hits"] + s["shared_hits"] for s in stats)
+    reads = hits + sum(s["misses"] for s in stats)
+    return {
+        "backend": backend_name,
+        "replicas": replicas,
+        "lookups": reads,
+        "hit_rate": round(hits / reads, 4) if reads else None,
+        "shared_hits": sum(s["shared_hits"] for s in stats),
+        "documents_read": sum(s["documents_read"] for s in stats),
+        "stale_reads": sum(s["stale_reads"] for s in stats),
+        "seconds": round(max(s["seconds"] for s in stats), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replicas", default="1,4,8", help="comma separated replica counts")
+    parser.add_argument("--backends", default="local,sqlite")
+    parser.add_argument("--lookups", type=int, default=40_000, help="total lookups, split across replicas")
+    parser.add_argument("--members", type=int, default=5_000)
+    parser.add_argument("--write-every", type=int, default=200, help="every n-th lookup is a profile save")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds each round's lookups are spread over")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for backend_name in args.backends.split(","):
+            for replicas in (int(r) for r in args.replicas.split(",")):
+                result = run_round(
+                    backend_name, replicas, args.lookups, args.members, args.write_every, args.duration, cache_dir,
+                )
+                results.append(result)
+                print(
+                    f"{backend_name:<7} x{replicas:<2} hit_rate={result['hit_rate']:.1%} "
+                    f"documents_read={result['documents_read']} shared_hits={result['shared_hits']} "
+                    f"stale_reads={result['stale_reads']} {result['seconds']:.2f}s"
+                )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Write-throughput benchmark for comments on a single hot announcement.
+
+Spawns an increasing number of concurrent commenters against one
+announcement document and reports how many comments per second land and
+how many are lost. Run against the Firestore emulator:
+
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.comment_throughput
+
+or against a real project with ``--key firestore-key.json``.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.comments import append_comment, build_comment
+
+
+def get_client(args):
+    """Return a Firestore client for the emulator or a service account key"""
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        from google.cloud import firestore
+        return firestore.Client(project=args.project)
+
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate(args.key))
+    return firestore.client()
+
+
+def read_modify_write(firestore_db, announcement_id, comment):
+    """The original embedded-array comment write path, kept for comparison"""
+    doc_ref = firestore_db.collection("announcements").document(announcement_id)
+    current_comments = doc_ref.get().to_dict().get("comments", [])
+    current_comments.append(comment)
+    doc_ref.update({"comments": current_comments})
+
+
+def run_round(firestore_db, writers, comments_per_writer, mode):
+    """Post comments from ``writers`` threads and count what was persisted"""
+    _, doc_ref = firestore_db.collection("announcements").add({
+        "title": f"benchmark {mode} x{writers}",
+        "content": "",
+        "author": "benchmark",
+        "timestamp": time.time(),
+        "comments": [],
+        "comment_count": 0,
+    })
+    write = append_comment if mode == "append" else read_modify_write
+    errors = []
+    errors_lock = threading.Lock()
+
+    def commenter(writer_id):
+        for i in range(comments_per_writer):
+            comment = build_comment(f"{writer_id}-{i}", f"writer {writer_id}", "")
+            try:
+                write(firestore_db, doc_ref.id, comment)
+            except Exception as e:
+                with errors_lock:
+                    errors.append(repr(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(commenter, range(writers)))
+    elapsed = time.perf_counter() - start
+
+    attempted = writers * comments_per_writer
+    if mode == "append":
+        persisted = len(list(doc_ref.collection("comments").stream()))
+        counted = doc_ref.get().to_dict().get("comment_count", 0)
+        for comment_ref in doc_ref.collection("comments").list_documents():
+            comment_ref.delete()
+    else:
+        persisted = counted = len(doc_ref.get().to_dict().get("comments", []))
+    doc_ref.delete()
+
+    return {
+        "mode": mode,
+        "writers": writers,
+        "attempted": attempted,
+        "persisted": persisted,
+        "lost": attempted - persisted,
+        "miscounted": counted - persisted,
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "comments_per_second": round(persisted / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", default="1,2,4,8,16,32",
+                        help="comma separated concurrent commenter counts")
+    parser.add_argument("--comments-per-writer", type=int, default=10)
+    parser.add_argument("--mode", choices=["append", "rmw", "both"], default="both")
+    parser.add_argument("--project", default="beerhauz-bench")
+    parser.add_argument("--key", default="firestore-key.json")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    firestore_db = get_client(args)
+    modes = ["append", "rmw"] if args.mode == "both" else [args.mode]
+    results = []
+    for mode in modes:
+        for writers in (int(w) for w in args.writers.split(",")):
+            result = run_round(firestore_db, writers, args.comments_per_writer, mode)
+            results.append(result)
+            print(
+                f"{mode:>6} writers={result['writers']:>3} "
+                f"persisted={result['persisted']}/{result['attempted']} "
+                f"lost={result['lost']} miscounted={result['miscounted']} errors={result['errors']} "
+                f"{result['comments_per_second']} comments/s"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,702 @@
+"""In-memory stand-ins for the Firestore, Auth and Storage clients.
+
+They implement the subset of the firebase_admin API the views use and
+count every backend call, so pages can be benchmarked without a network.
+Install them with ``install()``, which pre-populates the lazy client cache
+in ``configs.firebase_config``.
+"""
+import bisect
+import copy
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from google.api_core.exceptions import AlreadyExists, NotFound, PreconditionFailed
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+DOCUMENT_ID = "__name__"
+
+
+class RpcCounter:
+    """Thread-safe counter of backend calls and documents read.
+
+    ``latency`` makes every call take that many seconds, like a network
+    round trip, so concurrent sessions overlap as they would in production.
+    """
+
+    def __init__(self, latency=0.0):
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.calls = Counter()
+        self.documents_read = 0
+
+    def record(self, name, documents=0):
+        with self._lock:
+            self.calls[name] += 1
+            self.documents_read += documents
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.documents_read = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "rpcs": sum(self.calls.values()),
+                "documents_read": self.documents_read,
+                "calls": dict(self.calls),
+            }
+
+
+def _split(field_path):
+    # Segments that are not plain identifiers arrive quoted in backticks
+    return [part.strip("`") for part in field_path.split(".")]
+
+
+def _get_path(data, field_path):
+    for part in _split(field_path):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _set_path(data, field_path, value):
+    parts = _split(field_path)
+    for part in parts[:-1]:
+        data = data.setdefault(part, {})
+    data[parts[-1]] = value
+
+
+def _apply(data, field_path, value):
+    """Apply a single field write, honouring ArrayUnion, Increment and DELETE_FIELD"""
+    if value is DELETE_FIELD:
+        parent = _get_path(data, field_path.rsplit(".", 1)[0]) if "." in field_path else data
+        if isinstance(parent, dict):
+            parent.pop(_split(field_path)[-1], None)
+        return
+    if type(value).__name__ == "ArrayUnion":
+        current = list(_get_path(data, field_path) or [])
+        current.extend(v for v in value.values if v not in current)
+        value = current
+    elif type(value).__name__ == "Increment":
+        value = (_get_path(data, field_path) or 0) + value.value
+    _set_path(data, field_path, copy.deepcopy(value))
+
+
+def _project(data, field_paths):
+    projected = {}
+    for field_path in field_paths:
+        value = _get_path(data, field_path)
+        if value is not None:
+            _set_path(projected, field_path, copy.deepcopy(value))
+    return projected
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data, update_time):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+        self.update_time = update_time
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _get_path(self._data or {}, field_path)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, document_id):
+        self._collection = collection
+        self.id = document_id
+        self.path = f"{collection.id}/{document_id}"
+
+    def _snapshot(self, field_paths=None):
+        with self._collection.db.lock:
+            stored = self._collection.docs.get(self.id)
+        if stored is None:
+            return FakeSnapshot(self, None, None)
+        data, update_time = stored
+        if field_paths is not None:
+            data = _project(data, field_paths)
+        return FakeSnapshot(self, data, update_time)
+
+    def get(self, field_paths=None):
+        self._collection.db.counter.record("get", documents=1)
+        return self._snapshot(field_paths)
+
+    def collection(self, collection_id):
+        return self._collection.db.collection(f"{self.path}/{collection_id}")
+
+    def set(self, data, merge=False):
+        self._collection.db.counter.record("set")
+        self._write(data, merge)
+        self._collection.notify()
+
+    def _write(self, data, merge=False):
+        with self._collection.db.lock:
+            current = self._collection.docs.get(self.id)
+            new_data = copy.deepcopy(current[0]) if merge and current else {}
+            for key, value in data.items():
+                if merge and isinstance(value, dict) and isinstance(new_data.get(key), dict):
+                    for sub_key, sub_value in value.items():
+                        _apply(new_data, f"{key}.{sub_key}", sub_value)
+                else:
+                    _apply(new_data, key, value)
+            self._collection.store(self.id, new_data)
+
+    def update(self, data):
+        self._collection.db.counter.record("update")
+        self._update(data)
+        self._collection.notify()
+
+    def _update(self, data):
+        with self._collection.db.lock:
+            current = self._collection.docs.get(self.id)
+            if current is None:
+                raise KeyError(f"No document to update: {self.path}")
+            new_data = copy.deepcopy(current[0])
+            for field_path, value in data.items():
+                _apply(new_data, field_path, value)
+            self._collection.store(self.id, new_data)
+
+    def delete(self):
+        self._collection.db.counter.record("delete")
+        with self._collection.db.lock:
+            self._collection.remove(self.id)
+        self._collection.notify()
+
+
+class FakeWatch:
+    def __init__(self, query, callback):
+        self._query = query
+        self._callback = callback
+        self.is_active = True
+
+    def fire(self):
+        if self.is_active:
+            docs = self._query._run()
+            self._callback(docs, [], datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._query._collection.watches.remove(self)
+
+
+class FakeQuery:
+    def __init__(self, collection, field_paths=None, orders=(), offset_after=None, limit_count=None):
+        self._collection = collection
+        self._field_paths = field_paths
+        self._orders = tuple(orders)
+        self._start_after = offset_after
+        self._limit = limit_count
+
+    def _copy(self, **changes):
+        state = {
+            "field_paths": self._field_paths,
+            "orders": self._orders,
+            "offset_after": self._start_after,
+            "limit_count": self._limit,
+        }
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def select(self, field_paths):
+        return self._copy(field_paths=list(field_paths))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((str(field_path), direction),))
+
+    def limit(self, count):
+        return self._copy(limit_count=count)
+
+    def start_after(self, cursor):
+        return self._copy(offset_after=cursor)
+
+    def _sort_key(self, document_id, data):
+        key = []
+        for field_path, _ in self._orders:
+            value = document_id if field_path == DOCUMENT_ID else _get_path(data, field_path)
+            key.append(value)
+        key.append(document_id)
+        return key
+
+    def _cursor_key(self):
+        cursor = self._start_after
+        if isinstance(cursor, FakeSnapshot):
+            with self._collection.db.lock:
+                stored = self._collection.docs.get(cursor.id)
+            data = stored[0] if stored else {}
+            return self._sort_key(cursor.id, data)
+        # A dict of field values, in order_by order
+        return [cursor.get(field_path) if field_path != DOCUMENT_ID else cursor.get(DOCUMENT_ID)
+                for field_path, _ in self._orders]
+
+    def _run_by_document_id(self):
+        """Seek into the collection's sorted ids, like Firestore's own index"""
+        collection = self._collection
+        with collection.db.lock:
+            ids = collection.sorted_ids()
+            start = bisect.bisect_right(ids, self._cursor_key()[0]) if self._start_after is not None else 0
+            end = len(ids) if self._limit is None else start + self._limit
+            return [(document_id, *collection.docs[document_id]) for document_id in ids[start:end]]
+
+    def _run(self):
+        if self._orders and all(field_path == DOCUMENT_ID and not str(direction).upper().startswith("DESC")
+                                for field_path, direction in self._orders):
+            return self._snapshots(self._run_by_document_id())
+
+        with self._collection.db.lock:
+            items = [(document_id, data, update_time)
+                     for document_id, (data, update_time) in self._collection.docs.items()]
+        # Like Firestore, documents missing an ordered field are excluded
+        for field_path, _ in self._orders:
+            if field_path != DOCUMENT_ID:
+                items = [item for item in items if _get_path(item[1], field_path) is not None]
+
+        descending = bool(self._orders) and str(self._orders[0][1]).upper().startswith("DESC")
+
+        if self._start_after is not None:
+            cursor_key = self._cursor_key()
+            if descending:
+                items = [item for item in items if self._sort_key(item[0], item[1])[:len(cursor_key)] < cursor_key]
+            else:
+                items = [item for item in items if self._sort_key(item[0], item[1])[:len(cursor_key)] > cursor_key]
+
+        sort_key = lambda item: self._sort_key(item[0], item[1])
+        if self._limit is not None and self._limit < len(items):
+            # Pages through a large collection should not sort all of it each time
+            select = heapq.nlargest if descending else heapq.nsmallest
+            items = select(self._limit, items, key=sort_key)
+        else:
+            items.sort(key=sort_key, reverse=descending)
+
+        return self._snapshots(items)
+
+    def _snapshots(self, items):
+        snapshots = []
+        for document_id, data, update_time in items:
+            if self._field_paths is not None:
+                data = _project(data, self._field_paths)
+            else:
+                data = copy.deepcopy(data)
+            snapshots.append(FakeSnapshot(self._collection.document(document_id), data, update_time))
+        return snapshots
+
+    def stream(self):
+        docs = self._run()
+        self._collection.db.counter.record("stream", documents=max(len(docs), 1))
+        return iter(docs)
+
+    def get(self):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self, callback)
+        docs = self._run()
+        self._collection.db.counter.record("listen", documents=len(docs))
+        self._collection.watches.append(watch)
+        callback(docs, [], datetime.now(timezone.utc))
+        return watch
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db, collection_id):
+        super().__init__(self)
+        self.db = db
+        self.id = collection_id
+        self.docs = {}
+        self.watches = []
+        self._sorted_ids = None
+
+    def store(self, document_id, data):
+        if document_id not in self.docs:
+            self._sorted_ids = None
+        self.docs[document_id] = (data, self.db.next_update_time())
+
+    def remove(self, document_id):
+        if self.docs.pop(document_id, None) is not None:
+            self._sorted_ids = None
+
+    def sorted_ids(self):
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.docs)
+        return self._sorted_ids
+
+    def notify(self):
+        for watch in list(self.watches):
+            watch.fire()
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self, document_id or self.db.new_id())
+
+    def add(self, data):
+        self.db.counter.record("add")
+        ref = self.document()
+        with self.db.lock:
+            new_data = {}
+            for key, value in data.items():
+                _apply(new_data, key, value)
+            self.store(ref.id, new_data)
+        self.notify()
+        return self.db.next_update_time(), ref
+
+    def list_documents(self):
+        return [self.document(document_id) for document_id in list(self.docs)]
+
+
+class FakeWriteBatch:
+    """Writes applied together on commit, counted as a single RPC"""
+
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def create(self, reference, data):
+        self._writes.append(("create", reference, data))
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(("set", reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(("update", reference, data))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference))
+
+    def commit(self):
+        self._db.counter.record("commit")
+        with self._db.lock:
+            for write in self._writes:
+                reference = write[1]
+                if write[0] == "create" and reference.id in reference._collection.docs:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+            for write in self._writes:
+                kind, reference = write[0], write[1]
+                if kind in ("create", "set"):
+                    reference._write(write[2], merge=kind == "set" and write[3])
+                elif kind == "update":
+                    reference._update(write[2])
+                else:
+                    reference._collection.remove(reference.id)
+        for collection in {id(w[1]._collection): w[1]._collection for w in self._writes}.values():
+            collection.notify()
+        self._writes = []
+
+
+class FakeFirestore:
+    """In-memory Firestore client"""
+
+    def __init__(self, counter=None):
+        self.counter = counter or RpcCounter()
+        self.lock = threading.RLock()
+        self._collections = {}
+        self._ids = itertools.count()
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def new_id(self):
+        return f"doc{next(self._ids):08d}"
+
+    def next_update_time(self):
+        with self.lock:
+            self._clock += timedelta(microseconds=1)
+            return self._clock
+
+    def collection(self, collection_id):
+        with self.lock:
+            if collection_id not in self._collections:
+                self._collections[collection_id] = FakeCollectionReference(self, collection_id)
+            return self._collections[collection_id]
+
+    def document(self, document_path):
+        collection_path, _, document_id = document_path.rpartition("/")
+        return self.collection(collection_path).document(document_id)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def get_all(self, references, field_paths=None):
+        references = list(references)
+        self.counter.record("get_all", documents=len(references))
+        return [ref._snapshot(field_paths) for ref in references]
+
+    def seed(self, collection_id, documents):
+        """Load ``(document_id, data)`` pairs without counting any RPCs"""
+        collection = self.collection(collection_id)
+        with self.lock:
+            for document_id, data in documents:
+                collection.store(document_id or self.new_id(), data)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.cache_control = None
+        self.content_type = None
+        self.metadata = None
+
+    @property
+    def size(self):
+        stored = self.bucket.blobs.get(self.name)
+        return len(stored[0]) if stored else None
+
+    @property
+    def time_created(self):
+        stored = self.bucket.blobs.get(self.name)
+        return stored[1] if stored else None
+
+    @property
+    def updated(self):
+        meta = self.bucket.meta.get(self.name)
+        return meta[0] if meta else None
+
+    @property
+    def metageneration(self):
+        meta = self.bucket.meta.get(self.name)
+        return meta[1] if meta else None
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.counter.record("upload")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        now = datetime.now(timezone.utc)
+        with self.bucket.lock:
+            self.bucket.blobs[self.name] = (data, now, content_type)
+            self.bucket.meta[self.name] = (now, 1)
+
+    def patch(self):
+        """Write the blob's metadata, which bumps ``updated`` and ``metageneration``"""
+        self.bucket.counter.record("patch")
+        with self.bucket.lock:
+            if self.name not in self.bucket.blobs:
+                raise NotFound(f"No such blob: {self.name}")
+            self.bucket.meta[self.name] = (datetime.now(timezone.utc), self.bucket.meta[self.name][1] + 1)
+
+    def upload_from_file(self, file, content_type=None):
+        self.upload_from_string(file.read(), content_type=content_type)
+
+    def download_as_bytes(self):
+        self.bucket.counter.record("download")
+        return self.bucket.blobs[self.name][0]
+
+    def exists(self):
+        self.bucket.counter.record("exists")
+        return self.name in self.bucket.blobs
+
+    def delete(self, if_metageneration_match=None):
+        self.bucket.counter.record("delete_blob")
+        with self.bucket.lock:
+            if self.name not in self.bucket.blobs:
+                raise NotFound(f"No such blob: {self.name}")
+            if if_metageneration_match is not None and self.bucket.meta[self.name][1] != if_metageneration_match:
+                raise PreconditionFailed(f"Metageneration of {self.name} changed")
+            del self.bucket.blobs[self.name]
+            del self.bucket.meta[self.name]
+
+    def generate_signed_url(self, expiration, method="GET", **kwargs):
+        # Signing is local; pointing at the bundled default keeps renders offline
+        self.bucket.counter.record("sign")
+        return self.bucket.signed_url_target
+
+
+class FakeBucket:
+    """In-memory Cloud Storage bucket"""
+
+    def __init__(self, name="fake-bucket", counter=None, signed_url_target="images/default.jpg"):
+        self.name = name
+        self.counter = counter or RpcCounter()
+        self.lock = threading.RLock()
+        self.blobs = {}  # name -> (data, time_created, content_type)
+        self.meta = {}  # name -> (updated, metageneration)
+        self.signed_url_target = signed_url_target
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.blobs else None
+
+    def list_blobs(self, prefix="", max_results=None, page_token=None, page_size=1000):
+        with self.lock:
+            names = sorted(name for name in self.blobs if name.startswith(prefix))
+        if page_token:
+            names = [name for name in names if name > page_token]
+        if max_results is not None:
+            names = names[:max_results]
+        return FakeBlobIterator(self, names, page_size)
+
+    def seed(self, blobs):
+        """Load ``(name, data, time_created)`` triples without counting any RPCs"""
+        with self.lock:
+            for name, data, time_created in blobs:
+                self.blobs[name] = (data, time_created, None)
+                self.meta[name] = (time_created, 1)
+
+
+class FakeBlobIterator:
+    """A listing fetched one page, and one ``list`` call, at a time"""
+
+    def __init__(self, bucket, names, page_size):
+        self._bucket = bucket
+        self._names = names
+        self._page_size = page_size
+
+    @property
+    def pages(self):
+        for start in range(0, max(len(self._names), 1), self._page_size):
+            self._bucket.counter.record("list")
+            yield [FakeBlob(self._bucket, name) for name in self._names[start:start + self._page_size]]
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+
+class FakeUserRecord:
+    def __init__(self, uid, email, password=None):
+        self.uid = uid
+        self.email = email
+        self.password = password
+        self.display_name = None
+
+
+class UserNotFoundError(Exception):
+    pass
+
+
+class FakeAuth:
+    """In-memory stand-in for the firebase_admin.auth module"""
+
+    UserNotFoundError = UserNotFoundError
+
+    def __init__(self, counter=None):
+        self.counter = counter or RpcCounter()
+        self._users = {}
+        self._ids = itertools.count()
+
+    def create_user(self, email, password=None, uid=None):
+        self.counter.record("create_user")
+        uid = uid or f"user{next(self._ids):08d}"
+        user = FakeUserRecord(uid, email, password)
+        self._users[uid] = user
+        return user
+
+    def get_user(self, uid):
+        self.counter.record("get_user")
+        if uid not in self._users:
+            raise UserNotFoundError(uid)
+        return self._users[uid]
+
+    def get_user_by_email(self, email):
+        self.counter.record("get_user_by_email")
+        for user in self._users.values():
+            if user.email == email:
+                return user
+        raise UserNotFoundError(email)
+
+
+def install(firestore_db=None, auth=None, bucket=None, latency=0.0):
+    """Make configs.firebase_config hand out the fakes instead of real clients"""
+    from configs import firebase_config
+
+    counter = RpcCounter(latency)
+    firestore_db = firestore_db or FakeFirestore(counter)
+    auth = auth or FakeAuth(counter)
+    bucket = bucket or FakeBucket(counter=counter)
+    firebase_config._clients.update(firestore=firestore_db, auth=auth, storage=bucket)
+    return firestore_db, auth, bucket, counter
+
+
+def uninstall():
+    from configs import firebase_config
+    firebase_config._clients.clear()
+
+
+def make_user(index):
+    """A realistic user document"""
+    return {
+        "email": f"member{index}@example.com",
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=index),
+        "last_updated": datetime(2024, 1, 1) + timedelta(minutes=index),
+        "role": "user",
+        "first_name": f"First{index}",
+        "last_name": f"Last{index}",
+        "company": f"Company {index % 500}",
+        "position": ["Engineer", "Analyst", "Manager", "Designer"][index % 4],
+        "phone": f"+63 900 {index:07d}",
+        "address": {
+            "street": f"{index} Main St",
+            "city": ["Manila", "Cebu", "Davao", "Quezon City"][index % 4],
+            "state": "NCR",
+            "zip_code": f"{1000 + index % 900}",
+            "country": "Philippines",
+        },
+        "profile_pic_path": f"profile_pics/user{index:08d}_320.webp",
+        "profile_pic_variants": {
+            str(size): f"profile_pics/user{index:08d}_{size}.webp" for size in (64, 128, 320)
+        },
+        "skills": ["Python", "SQL", "Excel", "Marketing", "Design"][: 1 + index % 5],
+        "bio": "Beer enthusiast and community member. " * 5,
+    }
+
+
+def make_comments(index, comments):
+    """A thread of ``comments`` comments on announcement ``index``, oldest first"""
+    timestamp = datetime(2024, 1, 1) + timedelta(hours=index)
+    return [
+        {
+            "id": f"{index}-{c}",
+            "text": f"Comment {c} on announcement {index}",
+            "author": f"First{c} Last{c}",
+            "author_uid": f"user{c:08d}",
+            "author_pic": f"profile_pics/user{c:08d}_64.webp",
+            "timestamp": timestamp + timedelta(minutes=c),
+        }
+        for c in range(comments)
+    ]
+
+
+def make_announcement(index, comments, legacy=False):
+    """An announcement with ``comments`` comments, embedded when ``legacy``"""
+    thread = make_comments(index, comments)
+    announcement = {
+        "title": f"Announcement {index}",
+        "content": "Tonight's tap list and event details. " * 10,
+        "author": f"First{index} Last{index}",
+        "author_uid": f"user{index:08d}",
+        "timestamp": datetime(2024, 1, 1) + timedelta(hours=index),
+    }
+    if legacy:
+        announcement["comments"] = thread
+    else:
+        announcement["comment_count"] = len(thread)
+        announcement["latest_comments"] = {comment["id"]: comment for comment in thread[-3:]}
+    return announcement
+
+
+def seed(firestore_db, users=100, announcements=0, comments=0, legacy=False):
+    """Fill the fake database with a synthetic community.
+
+    Comment threads go to each announcement's ``comments`` subcollection,
+    or are embedded in the announcement as before with ``legacy``.
+    """
+    firestore_db.seed("users", ((f"user{i:08d}", make_user(i)) for i in range(users)))
+    firestore_db.seed("announcements", (
+        (f"ann{i:08d}", make_announcement(i, comments, legacy)) for i in range(announcements)
+    ))
+    if not legacy:
+        for i in range(announcements):
+            firestore_db.seed(
+                f"announcements/ann{i:08d}/comments",
+                ((comment["id"], comment) for comment in make_comments(i, comments)),
+            )
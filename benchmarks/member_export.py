@@ -0,0 +1,72 @@
+"""Time and memory benchmark for the member directory export.
+
+Seeds the in-memory Firebase fakes with increasing numbers of members and
+exports each size as CSV and Excel, reporting export time, rows per second
+and peak Python memory:
+
+    python -m benchmarks.member_export --members 10000,50000,100000
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from benchmarks import fake_firebase
+from services.member_export import EXPORT_FORMATS, export_members
+
+
+def run_round(firestore_db, export_format):
+    path, rows, seconds = export_members(firestore_db, export_format)
+    size_bytes = os.path.getsize(path)
+    os.remove(path)
+
+    # Memory is measured on a second pass so tracing does not skew the timing
+    tracemalloc.start()
+    path, _, _ = export_members(firestore_db, export_format)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(path)
+
+    return {
+        "format": export_format,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        "peak_memory_bytes": peak_bytes,
+        "file_bytes": size_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", default="10000,50000,100000",
+                        help="comma separated directory sizes")
+    parser.add_argument("--formats", default=",".join(EXPORT_FORMATS))
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for members in (int(m) for m in args.members.split(",")):
+        firestore_db = fake_firebase.FakeFirestore()
+        fake_firebase.seed(firestore_db, users=members)
+        for export_format in args.formats.split(","):
+            start = time.perf_counter()
+            result = run_round(firestore_db, export_format)
+            result["members"] = members
+            results.append(result)
+            print(
+                f"{members:>7} {export_format:<6} {result['seconds']:.2f}s "
+                f"{result['rows_per_second']} rows/s "
+                f"peak={result['peak_memory_bytes'] / 1e6:.1f}MB "
+                f"file={result['file_bytes'] / 1e6:.1f}MB "
+                f"({time.perf_counter() - start:.0f}s with the traced pass)"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
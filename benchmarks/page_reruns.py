@@ -0,0 +1,179 @@
+"""Per-page rerun benchmark against the in-memory Firebase fakes.
+
+Runs app.py through streamlit.testing.v1.AppTest with a logged-in session
+on each page and reports cold and warm rerun wall time, backend RPCs and
+documents read, and peak Python memory, for several dataset sizes:
+
+    python -m benchmarks.page_reruns --datasets small,10k
+    python -m benchmarks.page_reruns --compare benchmarks/results/<old>.json
+
+Results are written as JSON so runs on different commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks import fake_firebase
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+PAGES = ("Members", "Announcements", "Profile")
+
+DATASETS = {
+    "small": {"users": 100, "announcements": 100, "comments": 20},
+    "10k": {"users": 10_000, "announcements": 1_000, "comments": 200},
+    "50k": {"users": 50_000, "announcements": 1_000, "comments": 200},
+}
+
+RUN_TIMEOUT_SECONDS = 600
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def _new_session(page, cache_dir):
+    """A fresh browser session, logged in as the first seeded member"""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    at = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT_SECONDS)
+    at.secrets["KEY"] = "{}"
+    at.secrets["BUCKET"] = "fake-bucket"
+    at.secrets["IMAGE_CACHE_DIR"] = cache_dir
+    at.secrets["WRITE_QUEUE_PATH"] = os.path.join(cache_dir, "write_queue.sqlite3")
+    at.secrets["MIRROR_PATH"] = os.path.join(cache_dir, "mirror.sqlite3")
+    at.session_state["is_authenticated"] = True
+    at.session_state["user"] = fake_firebase.FakeUserRecord("user00000000", "member0@example.com")
+    at.session_state["current_page"] = page
+    return at
+
+
+def _errors(at):
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+def bench_page(page, counter, cache_dir, warm_runs):
+    """Measure one page: a cold run, ``warm_runs`` reruns and a cold run under tracemalloc"""
+    at = _new_session(page, cache_dir)
+    counter.reset()
+    start = time.perf_counter()
+    at.run()
+    cold_seconds = time.perf_counter() - start
+    cold_rpcs = counter.snapshot()
+
+    warm_seconds = []
+    counter.reset()
+    for _ in range(warm_runs):
+        start = time.perf_counter()
+        at.run()
+        warm_seconds.append(time.perf_counter() - start)
+    warm_rpcs = counter.snapshot()
+    errors = _errors(at)
+
+    # Memory is measured separately so tracing does not skew the timings
+    at = _new_session(page, cache_dir)
+    tracemalloc.start()
+    at.run()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "page": page,
+        "cold_seconds": round(cold_seconds, 4),
+        "warm_seconds_mean": round(statistics.mean(warm_seconds), 4) if warm_seconds else None,
+        "warm_seconds_max": round(max(warm_seconds), 4) if warm_seconds else None,
+        "cold_rpcs": cold_rpcs["rpcs"],
+        "cold_documents_read": cold_rpcs["documents_read"],
+        "cold_calls": cold_rpcs["calls"],
+        "warm_rpcs_per_rerun": warm_rpcs["rpcs"] / warm_runs if warm_runs else None,
+        "warm_documents_read_per_rerun": warm_rpcs["documents_read"] / warm_runs if warm_runs else None,
+        "peak_memory_bytes": peak_bytes,
+        "errors": errors,
+    }
+
+
+def run(datasets, pages, warm_runs):
+    results = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for dataset in datasets:
+            firestore_db, _, _, counter = fake_firebase.install()
+            fake_firebase.seed(firestore_db, **DATASETS[dataset])
+            # Local files like the mirror belong to one dataset's fake database
+            dataset_dir = os.path.join(cache_dir, dataset)
+            os.makedirs(dataset_dir)
+            for page in pages:
+                result = bench_page(page, counter, dataset_dir, warm_runs)
+                result["dataset"] = dataset
+                result.update(DATASETS[dataset])
+                results.append(result)
+                print(
+                    f"{dataset:>6} {page:<14} cold={result['cold_seconds']:.3f}s "
+                    f"warm={result['warm_seconds_mean']}s rpcs={result['cold_rpcs']}/"
+                    f"{result['warm_rpcs_per_rerun']} docs={result['cold_documents_read']} "
+                    f"peak={result['peak_memory_bytes'] / 1e6:.1f}MB"
+                    + (f" errors={result['errors']}" if result["errors"] else "")
+                )
+            fake_firebase.uninstall()
+    return results
+
+
+def compare(results, baseline_file):
+    """Print the change of every metric against an earlier results file"""
+    with open(baseline_file) as f:
+        baseline = {(r["dataset"], r["page"]): r for r in json.load(f)["results"]}
+    for result in results:
+        old = baseline.get((result["dataset"], result["page"]))
+        if old is None:
+            continue
+        deltas = []
+        for metric in ("cold_seconds", "warm_seconds_mean", "cold_rpcs", "warm_rpcs_per_rerun", "peak_memory_bytes"):
+            if old.get(metric) and result.get(metric) is not None:
+                deltas.append(f"{metric} {100 * (result[metric] - old[metric]) / old[metric]:+.0f}%")
+        print(f"{result['dataset']:>6} {result['page']:<14} " + ", ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datasets", default="small,10k,50k",
+                        help=f"comma separated, from {', '.join(DATASETS)}")
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--warm-runs", type=int, default=5)
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    results = run(args.datasets.split(","), args.pages.split(","), args.warm_runs)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "streamlit": st.__version__,
+            "results": results,
+        }, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
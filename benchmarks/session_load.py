@@ -0,0 +1,131 @@
+"""Backend load of many sessions opening the Members and Announcements pages at once.
+
+Starts a fresh process-wide state (empty local mirror, caches and member
+index) and lets 1, 10, 100 and 500 sessions arrive at the same moment,
+each running the reads those two pages make: the mirror's first sync,
+the member index, the announcement feed window, author profiles through
+the shared document cache, the avatar urls and one page of history.
+Every fake backend call takes ``--latency`` seconds so the sessions'
+reads overlap. Reports backend RPCs per round, which should stay flat
+as sessions grow, and how many reads were shared:
+
+    python -m benchmarks.session_load --sessions 1,10,100,500
+    python -m benchmarks.session_load --no-coalescing
+
+Sessions run as threads of one process and call the services directly,
+since AppTest swaps process-wide state on every run.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime.secrets import Secrets
+
+from benchmarks import fake_firebase
+from services.announcement_feed import get_announcement_feed
+from services.data_cache import get_document_cache
+from services.images import pick_profile_pic_path
+from services.local_mirror import get_local_mirror
+from services.member_index import get_member_index
+from services.profiles import AVATAR_WIDTH
+from services.signed_urls import get_signed_url_manager
+from services.single_flight import get_single_flight
+from Views.announcements import HISTORY_PAGE_SIZE, _fetch_posts_before
+from Views.members import MEMBER_CARD_FIELDS, MEMBER_PIC_WIDTH, MEMBERS_PAGE_SIZE
+
+DATASET = {"users": 2_000, "announcements": 100, "comments": 5}
+
+
+def _session(firestore_db, start, errors):
+    """The reads of one session landing on Members, then on Announcements"""
+    start.wait()
+    try:
+        get_local_mirror()
+        index = get_member_index(firestore_db, MEMBER_CARD_FIELDS)
+        members = [index.get(uid) for uid in index.all()[:MEMBERS_PAGE_SIZE]]
+        get_signed_url_manager().get_urls(pick_profile_pic_path(member, MEMBER_PIC_WIDTH) for member in members)
+
+        window = get_announcement_feed(firestore_db).get_posts()
+        authors = get_document_cache().get_many(firestore_db, "users", {post["author_uid"] for post in window})
+        get_signed_url_manager().get_urls(pick_profile_pic_path(author, AVATAR_WIDTH) for author in authors.values())
+        if window:
+            _fetch_posts_before(firestore_db, (window[-1]["timestamp"], window[-1]["id"]), HISTORY_PAGE_SIZE)
+    except Exception as e:
+        errors.append(repr(e))
+
+
+def run_round(sessions, latency, coalescing, work_dir):
+    """Run ``sessions`` concurrent sessions against a freshly started process state"""
+    firestore_db, _, _, counter = fake_firebase.install(latency=latency)
+    fake_firebase.seed(firestore_db, **DATASET)
+    secrets = Secrets()
+    secrets._secrets = {
+        "IMAGE_CACHE_DIR": work_dir,
+        "WRITE_QUEUE_PATH": os.path.join(work_dir, f"write_queue-{sessions}.sqlite3"),
+        "MIRROR_PATH": os.path.join(work_dir, f"mirror-{sessions}.sqlite3"),
+    }
+    st.secrets = secrets
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    single_flight = get_single_flight()
+    single_flight.enabled = coalescing
+
+    start = threading.Barrier(sessions)
+    errors = []
+    threads = [
+        threading.Thread(target=_session, args=(firestore_db, start, errors), name=f"session-{i}")
+        for i in range(sessions)
+    ]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - began
+
+    rpcs = counter.snapshot()
+    get_announcement_feed(firestore_db).close()
+    fake_firebase.uninstall()
+    return {
+        "sessions": sessions,
+        "coalescing": coalescing,
+        "rpcs": rpcs["rpcs"],
+        "documents_read": rpcs["documents_read"],
+        "calls": rpcs["calls"],
+        "single_flight": single_flight.get_stats(),
+        "seconds": round(seconds, 3),
+        "errors": errors[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="1,10,100,500", help="comma separated concurrent session counts")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds every backend call takes")
+    parser.add_argument("--no-coalescing", action="store_true", help="disable the single-flight group")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for sessions in (int(s) for s in args.sessions.split(",")):
+            result = run_round(sessions, args.latency, not args.no_coalescing, work_dir)
+            results.append(result)
+            print(
+                f"sessions={sessions:<4} rpcs={result['rpcs']:<5} documents_read={result['documents_read']:<7} "
+                f"shared={result['single_flight']['shared']:<5} {result['seconds']:.2f}s "
+                + " ".join(f"{name}={count}" for name, count in sorted(result["calls"].items()))
+                + (f" errors={result['errors']}" if result["errors"] else "")
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,96 @@
 import json
+import os
+import threading
+import time
 import firebase_admin
-from firebase_admin import credentials, firestore, auth, storage
+from firebase_admin import credentials
 import streamlit as st
+from services.instrumentation import instrument
 
-# Initialize Firebase services
-def initialize_firebase():
-    key_dict = json.loads(st.secrets["KEY"])
-    storage_bucket = st.secrets["BUCKET"]  
-    
-    # Initialize Firebase app if not already initialized
+# Clients are created on first use so importing this module stays cheap
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Seconds spent initializing each backend client, for startup profiling
+init_timings = {}
+
+
+def _initialize_app():
+    """Initialize the Firebase app if not already initialized"""
     if not firebase_admin._apps:
+        key_dict = json.loads(st.secrets["KEY"])
         cred = credentials.Certificate(key_dict)
-        firebase_app = firebase_admin.initialize_app(
+        firebase_admin.initialize_app(
             cred,
             {
-                'storageBucket': storage_bucket
+                'storageBucket': st.secrets["BUCKET"]
             }
         )
-    
-    # Initialize individual services
-    firestore_db = firestore.client()
-    auth_client = auth
-    storage_client = storage.bucket(storage_bucket)  # Explicitly specify the bucket name
-    
-    return firestore_db, auth_client, storage_client
-
-try:
-    firestore_db, auth_client, storage_client = initialize_firebase()
-except ValueError as e:
-    st.error(f"Firebase initialization error: {e}")
-    raise
+
+
+def _create_firestore():
+    from firebase_admin import firestore
+    return firestore.client()
+
+
+def _create_auth():
+    from firebase_admin import auth
+    return auth
+
+
+def _create_storage():
+    from firebase_admin import storage
+    return storage.bucket(st.secrets["BUCKET"])  # Explicitly specify the bucket name
+
+
+def _get_client(name, factory):
+    """Return a cached client, creating it (and the Firebase app) on first use"""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        if name not in _clients:
+            start = time.perf_counter()
+            try:
+                _initialize_app()
+                _clients[name] = instrument(factory(), name)
+            except ValueError as e:
+                st.error(f"Firebase initialization error: {e}")
+                raise
+            init_timings[name] = time.perf_counter() - start
+        return _clients[name]
+
+
+def get_project_id():
+    """Return the Firebase project id from the service account key or environment"""
+    try:
+        return json.loads(st.secrets["KEY"])["project_id"]
+    except Exception:
+        return os.environ.get("GOOGLE_CLOUD_PROJECT")
+
+
+def get_setting(name, default=None):
+    """Return an optional setting from secrets, ``default`` when it or the secrets file is missing"""
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+def initialize_firebase():
+    """Initialize every Firebase service eagerly"""
+    return get_firestore(), get_auth(), get_storage()
+
 
 def get_firestore():
     """Return Firestore database instance"""
-    return firestore_db
+    return _get_client("firestore", _create_firestore)
 
 def get_auth():
     """Return Firebase Auth instance"""
-    return auth_client
+    return _get_client("auth", _create_auth)
 
 def get_storage():
     """Return Cloud Storage bucket instance"""
-    return storage_client
+    return _get_client("storage", _create_storage)
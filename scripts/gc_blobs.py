@@ -0,0 +1,56 @@
+"""Delete profile pictures no user document references any more.
+
+Replaced pictures are deleted after a profile save commits, but a
+delete that kept failing, or a picture replaced before that existed,
+leaves the blob behind. This lists the ``profile_pics/`` prefix, reads
+which paths the ``users`` documents and the saves still in the write
+queue point at, and deletes the rest once they have not been written or
+reused for the grace period. Run it on the app host, with the app's
+secrets available, first with ``--dry-run`` to see what would go:
+
+    python -m scripts.gc_blobs --dry-run
+    python -m scripts.gc_blobs --grace-hours 48 --workers 64
+
+Pass ``--write-queue`` once per queue file when the app runs on several
+hosts.
+"""
+import argparse
+from datetime import timedelta
+
+from configs.firebase_config import get_firestore, get_storage
+from services.blob_gc import DELETE_WORKERS, PROFILE_PICS_PREFIX, collect_orphaned_blobs
+from services.write_queue import queue_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prefix", default=PROFILE_PICS_PREFIX)
+    parser.add_argument("--grace-hours", type=float, default=24, help="keep orphans younger than this")
+    parser.add_argument("--workers", type=int, default=DELETE_WORKERS, help="concurrent deletes")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    parser.add_argument("--write-queue", action="append",
+                        help="write queue file whose pending saves count as references, defaults to this host's")
+    args = parser.parse_args()
+
+    report = collect_orphaned_blobs(
+        get_firestore(), get_storage(),
+        prefix=args.prefix,
+        grace=timedelta(hours=args.grace_hours),
+        workers=args.workers,
+        dry_run=args.dry_run,
+        queue_paths=args.write_queue or [queue_path()],
+    )
+    verb = "Would delete" if args.dry_run else "Deleted"
+    count = report["orphans"] if args.dry_run else report["deleted"]
+    print(
+        f"Listed {report['listed']} blobs, {report['referenced']} referenced paths. "
+        f"{verb} {count} orphans, {report['bytes_reclaimed'] / 1e6:.1f} MB "
+        f"in {report['seconds']:.1f}s ({report['deletes_per_second']} deletes/s)"
+        + (f", {report['failed']} failed" if report["failed"] else "")
+        + (f", {report['changed']} kept as reused meanwhile" if report["changed"] else "")
+        + (f", {report['unreadable_references']} unreadable references" if report["unreadable_references"] else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
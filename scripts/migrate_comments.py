@@ -0,0 +1,34 @@
+"""Move embedded announcement comments into per-announcement threads.
+
+Announcements used to embed every comment in a ``comments`` array. They
+now keep the thread in an ``announcements/{id}/comments`` subcollection
+plus a ``comment_count`` and a ``latest_comments`` preview. Run once after
+deploying, with the app's secrets available:
+
+    python -m scripts.migrate_comments
+
+Re-running it is safe; already migrated announcements are skipped.
+"""
+import argparse
+
+from configs.firebase_config import get_firestore
+from services.comments import migrate_announcement, migrate_announcements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--announcement", help="migrate a single announcement id")
+    args = parser.parse_args()
+
+    firestore_db = get_firestore()
+    if args.announcement:
+        moved = migrate_announcement(firestore_db, args.announcement)
+        print(f"Moved {moved} comments of {args.announcement}")
+        return
+
+    migrated, moved = migrate_announcements(firestore_db)
+    print(f"Moved {moved} comments out of {migrated} announcements")
+
+
+if __name__ == "__main__":
+    main()
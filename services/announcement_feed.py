@@ -0,0 +1,120 @@
+import threading
+import time
+
+import streamlit as st
+
+from services.comments import FEED_FIELDS
+from services.data_cache import document_key, get_document_cache
+
+FEED_WINDOW_SIZE = 10
+POLL_INTERVAL_SECONDS = 15
+LISTENER_RETRY_SECONDS = 60
+
+
+def _to_post(doc):
+    post = doc.to_dict()
+    post["id"] = doc.id
+    return post
+
+
+class AnnouncementFeed:
+    """Process-wide window of the most recent announcements.
+
+    A single Firestore snapshot listener keeps the window current, so
+    sessions read it from memory without issuing any RPCs. If the listener
+    stops, the window is refreshed by polling until it can be restarted.
+    """
+
+    def __init__(self, firestore_db, document_cache=None, window_size=FEED_WINDOW_SIZE):
+        self._firestore_db = firestore_db
+        self._document_cache = document_cache
+        self._window_size = window_size
+        self._lock = threading.Lock()
+        self._posts = []
+        self._version = 0
+        self._has_snapshot = False
+        self._watch = None
+        self._last_poll = 0.0
+        self._last_listen_attempt = 0.0
+        self._start_listener()
+
+    def _query(self):
+        return self._firestore_db.collection("announcements")\
+                                 .order_by("timestamp", direction="DESCENDING")\
+                                 .limit(self._window_size)
+
+    def _start_listener(self):
+        self._last_listen_attempt = time.time()
+        try:
+            self._watch = self._query().on_snapshot(self._on_snapshot)
+        except Exception as e:
+            print(f"Announcement listener failed to start: {e}")
+            self._watch = None
+
+    def _remember(self, docs):
+        """Share fetched announcements with the document cache, stamped by update_time"""
+        if self._document_cache is None:
+            return
+        for doc in docs:
+            self._document_cache.put(document_key("announcements", doc.id), doc.to_dict(), doc.update_time)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # ``docs`` is the full, ordered result set of the query
+        self._remember(docs)
+        posts = [_to_post(doc) for doc in docs][:self._window_size]
+        with self._lock:
+            self._posts = posts
+            self._version += 1
+            self._has_snapshot = True
+
+    def _listener_active(self):
+        return self._watch is not None and getattr(self._watch, "is_active", False)
+
+    def _poll(self):
+        # A poll only needs the fields the feed renders, not the whole document
+        docs = list(self._query().select(FEED_FIELDS).stream())
+        self._remember(docs)
+        posts = [_to_post(doc) for doc in docs]
+        with self._lock:
+            if posts != self._posts:
+                self._posts = posts
+                self._version += 1
+            self._last_poll = time.time()
+
+    def _ensure_fresh(self):
+        if self._listener_active():
+            if self._has_snapshot:
+                return
+        elif time.time() - self._last_listen_attempt >= LISTENER_RETRY_SECONDS:
+            self._start_listener()
+
+        # Listener down or has not delivered yet: fall back to polling
+        if time.time() - self._last_poll >= POLL_INTERVAL_SECONDS:
+            with self._lock:
+                # Another session may have polled while we waited
+                if time.time() - self._last_poll < POLL_INTERVAL_SECONDS:
+                    return
+                self._last_poll = time.time()
+            self._poll()
+
+    def current_version(self):
+        """Return a counter bumped every time the window changes, polling first if due"""
+        self._ensure_fresh()
+        return self._version
+
+    def get_posts(self):
+        """Return a copy of the current window, newest first"""
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._posts)
+
+    def close(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+
+@st.cache_resource(show_spinner=False)
+def get_announcement_feed(_firestore_db):
+    """Return the process-wide announcement feed"""
+    return AnnouncementFeed(_firestore_db, document_cache=get_document_cache())
@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from services.images import blob_path_from_url, profile_pic_paths
+from services.write_queue import read_pending_ops
+
+PROFILE_PICS_PREFIX = "profile_pics/"
+# Blobs not written or reused for this long can no longer belong to a save in flight
+DEFAULT_GRACE = timedelta(hours=24)
+LIST_PAGE_SIZE = 1000
+DELETE_WORKERS = 32
+
+PICTURE_FIELDS = ["profile_pic_path", "profile_pic_variants", "profile_pic_url"]
+
+
+def list_candidates(storage_bucket, prefix=PROFILE_PICS_PREFIX, grace=DEFAULT_GRACE, page_size=LIST_PAGE_SIZE):
+    """List the prefix page by page.
+
+    Returns the number of blobs listed and name -> (size, metageneration)
+    of those not updated within ``grace``. Reusing a picture touches its
+    blob, so ``updated`` rather than ``time_created`` is compared.
+    """
+    cutoff = datetime.now(timezone.utc) - grace
+    listed, candidates = 0, {}
+    for page in storage_bucket.list_blobs(prefix=prefix, page_size=page_size).pages:
+        for blob in page:
+            listed += 1
+            last_written = blob.updated or blob.time_created
+            if last_written is not None and last_written < cutoff:
+                candidates[blob.name] = (blob.size or 0, blob.metageneration)
+    return listed, candidates
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+
+
+def referenced_paths(firestore_db, queue_paths=()):
+    """Return the blob paths user documents and queued writes point at, and the unreadable urls.
+
+    Legacy documents reference their picture through a signed url only;
+    its blob path is read back from the url. Writes still waiting in a
+    write queue file count as referencing every path or url they carry.
+    """
+    paths, unreadable = set(), []
+    for doc in firestore_db.collection("users").select(PICTURE_FIELDS).stream():
+        try:
+            paths.update(profile_pic_paths(doc.to_dict() or {}, strict=True))
+        except ValueError:
+            unreadable.append(doc.id)
+    for queue_path in queue_paths:
+        for _, _, data, _ in read_pending_ops(queue_path):
+            for value in _strings(data):
+                if "://" not in value:
+                    paths.add(value)
+                    continue
+                try:
+                    paths.add(blob_path_from_url(value))
+                except ValueError:
+                    unreadable.append(value)
+    paths.discard(None)
+    return paths, unreadable
+
+
+def _delete(storage_bucket, name, metageneration):
+    try:
+        # Fails if the blob was touched, e.g. reused by a save, after it was listed
+        storage_bucket.blob(name).delete(if_metageneration_match=metageneration)
+        return "deleted"
+    except NotFound:
+        # Removed meanwhile, e.g. by a profile save replacing it
+        return "missing"
+    except PreconditionFailed:
+        return "changed"
+    except Exception as e:
+        print(f"Could not delete {name}: {e}")
+        return "failed"
+
+
+def collect_orphaned_blobs(firestore_db, storage_bucket, prefix=PROFILE_PICS_PREFIX, grace=DEFAULT_GRACE,
+                           workers=DELETE_WORKERS, dry_run=False, page_size=LIST_PAGE_SIZE, queue_paths=()):
+    """Delete blobs under ``prefix`` that nothing references and return a report.
+
+    The bucket is listed before references are read, and each delete
+    only succeeds if the blob was not touched since it was listed, so a
+    picture reused while the collector runs is kept. Nothing is deleted
+    when a referencing url cannot be read, since its blob is unknown.
+    With ``dry_run`` nothing is deleted and the report shows what would be.
+    """
+    started = time.perf_counter()
+    listed, candidates = list_candidates(storage_bucket, prefix, grace, page_size)
+    listed_at = time.perf_counter()
+    referenced, unreadable = referenced_paths(firestore_db, queue_paths)
+    orphans = sorted(name for name in candidates if name not in referenced)
+    scanned_at = time.perf_counter()
+
+    outcomes = {"deleted": 0, "missing": 0, "changed": 0, "failed": 0}
+    reclaimed = 0
+    if dry_run:
+        reclaimed = sum(candidates[name][0] for name in orphans)
+    elif unreadable:
+        print(f"Not deleting anything, {len(unreadable)} picture references could not be read: {unreadable[:5]}")
+    elif orphans:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda name: _delete(storage_bucket, name, candidates[name][1]), orphans)
+            for name, outcome in zip(orphans, results):
+                outcomes[outcome] += 1
+                if outcome == "deleted":
+                    reclaimed += candidates[name][0]
+    finished = time.perf_counter()
+
+    delete_seconds = finished - scanned_at
+    return {
+        "prefix": prefix,
+        "dry_run": dry_run,
+        "listed": listed,
+        "older_than_grace": len(candidates),
+        "referenced": len(referenced),
+        "unreadable_references": len(unreadable),
+        "orphans": len(orphans),
+        **outcomes,
+        "bytes_reclaimed": reclaimed,
+        "list_seconds": round(listed_at - started, 3),
+        "scan_seconds": round(scanned_at - listed_at, 3),
+        "delete_seconds": round(delete_seconds, 3),
+        "deletes_per_second": round(outcomes["deleted"] / delete_seconds) if outcomes["deleted"] else 0,
+        "seconds": round(finished - started, 3),
+    }
@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from services.write_queue import decode_value, encode_value
+
+DEFAULT_SHARED_CACHE_PATH = os.path.join(".cache", "shared_cache.sqlite3")
+# How often a process looks for invalidations made by the others
+INVALIDATION_POLL_SECONDS = 0.25
+# Invalidations are kept this long for processes that poll late
+INVALIDATION_RETENTION_SECONDS = 3600
+# Stay below SQLite's bound parameter limit
+_CHUNK = 500
+
+
+class LocalBackend:
+    """Nothing is shared: every process only has its own in-memory entries.
+
+    Cache backends sit behind a process's in-memory caches. ``get_many``
+    returns what other processes stored, ``set_many`` shares entries,
+    ``delete_many`` removes entries everywhere and ``invalidations``
+    returns keys other processes deleted since the last call. A
+    ``read_token`` taken before reading the backing store, passed to
+    ``set_many`` as ``since``, keeps a read that raced an invalidation
+    from being shared.
+    """
+
+    name = "local"
+
+    def get_many(self, namespace, keys):
+        return {}
+
+    def read_token(self):
+        return None
+
+    def set_many(self, namespace, items, ttl, since=None):
+        pass
+
+    def delete_many(self, namespace, keys):
+        pass
+
+    def invalidations(self, namespace):
+        return []
+
+    def get_stats(self):
+        return {"backend": self.name}
+
+
+class SqliteBackend(LocalBackend):
+    """Entries shared by every process on the host through one SQLite file.
+
+    Deleting a key also appends it to an invalidation log. Each process
+    polls the log at most every quarter second and drops the keys other
+    processes deleted from its in-memory caches.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, poll_interval=INVALIDATION_POLL_SECONDS):
+        self._poll_interval = poll_interval
+        self._origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._last_poll = {}  # namespace -> time of the last invalidation poll
+        self._pending = {}  # namespace -> keys invalidated elsewhere, not yet handed out
+        self.stats = {
+            "hits": 0, "misses": 0, "writes": 0, "stale_writes": 0,
+            "invalidations_sent": 0, "invalidations_received": 0,
+        }
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS invalidations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        # Invalidations from before this process started are already reflected in the entries
+        self._seen = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _CHUNK):
+                chunk = keys[start:start + _CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    [namespace, now, *chunk],
+                ).fetchall()
+                found.update((key, decode_value(json.loads(value))) for key, value in rows)
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def read_token(self):
+        """Return the newest invalidation's sequence number"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+    def set_many(self, namespace, items, ttl, since=None):
+        """Share entries, skipping keys invalidated after the ``since`` read token"""
+        if not items:
+            return
+        expires_at = time.time() + ttl
+        keys = list(items)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                stale = set()
+                if since is not None:
+                    # The value was read before this invalidation's write landed, it must not be shared
+                    for start in range(0, len(keys), _CHUNK):
+                        chunk = keys[start:start + _CHUNK]
+                        stale.update(key for (key,) in self._db.execute(
+                            f"SELECT DISTINCT key FROM invalidations WHERE namespace = ? AND seq > ? "
+                            f"AND key IN ({','.join('?' * len(chunk))})",
+                            [namespace, since, *chunk],
+                        ))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    [
+                        (namespace, key, json.dumps(encode_value(value)), expires_at)
+                        for key, value in items.items() if key not in stale
+                    ],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.stats["writes"] += len(items) - len(stale)
+            self.stats["stale_writes"] += len(stale)
+
+    def delete_many(self, namespace, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?", [(namespace, key) for key in keys]
+                )
+                self._db.executemany(
+                    "INSERT INTO invalidations (namespace, key, origin, created_at) VALUES (?, ?, ?, ?)",
+                    [(namespace, key, self._origin, now) for key in keys],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.stats["invalidations_sent"] += len(keys)
+
+    def invalidations(self, namespace):
+        now = time.time()
+        with self._lock:
+            if now - self._last_poll.get(namespace, 0.0) < self._poll_interval:
+                return []
+            self._last_poll[namespace] = now
+            rows = self._db.execute(
+                "SELECT seq, namespace, key, origin FROM invalidations WHERE seq > ? ORDER BY seq", (self._seen,)
+            ).fetchall()
+            if rows:
+                self._seen = rows[-1][0]
+                self._db.execute(
+                    "DELETE FROM invalidations WHERE created_at < ?", (now - INVALIDATION_RETENTION_SECONDS,)
+                )
+                self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            for _, row_namespace, key, origin in rows:
+                if origin != self._origin:
+                    # Other namespaces' keys are handed out on their own next poll
+                    self._pending.setdefault(row_namespace, []).append(key)
+            keys = self._pending.pop(namespace, [])
+            self.stats["invalidations_received"] += len(keys)
+            return keys
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, backend=self.name)
+
+
+def _secret(name, default=None):
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache_backend():
+    """Return the process's cache backend, chosen by the CACHE_BACKEND secret"""
+    if _secret("CACHE_BACKEND", "local") == "sqlite":
+        return SqliteBackend(_secret("SHARED_CACHE_PATH", DEFAULT_SHARED_CACHE_PATH))
+    return LocalBackend()
@@ -0,0 +1,175 @@
+import random
+import time
+import uuid
+from datetime import datetime
+
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud.firestore_v1 import DELETE_FIELD, Increment
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from services.write_queue import create_op, update_op
+
+# Errors Firestore raises when a hot document is under write contention
+RETRYABLE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.ServiceUnavailable,
+    gcp_exceptions.ResourceExhausted,
+)
+
+# Comments kept on the announcement itself for the feed preview
+LATEST_COMMENTS_SIZE = 3
+
+# Firestore rejects batches of more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Announcement fields the feed needs; the thread lives in a subcollection, except on
+# legacy posts not migrated yet, which still embed a ``comments`` array
+FEED_FIELDS = [
+    "title", "content", "author", "author_uid", "timestamp", "comment_count", "latest_comments", "comments",
+]
+
+
+def build_comment(text, author, author_pic, author_uid=None):
+    """Create a new comment entry for an announcement"""
+    return {
+        # Unique id, also the comment's document id in the thread
+        "id": uuid.uuid4().hex,
+        "text": text,
+        "author": author,
+        "author_uid": author_uid,
+        "timestamp": datetime.now(),
+        "author_pic": author_pic,
+    }
+
+
+def _comments_ref(firestore_db, announcement_id):
+    return firestore_db.collection("announcements").document(announcement_id).collection("comments")
+
+
+def _latest_field(comment_id):
+    return FieldPath("latest_comments", comment_id).to_api_repr()
+
+
+def _by_timestamp(comment):
+    timestamp = comment.get("timestamp")
+    return (timestamp is None, timestamp.timestamp() if hasattr(timestamp, "timestamp") else 0)
+
+
+def latest_comments(post):
+    """Return an announcement's preview comments, oldest first"""
+    return sorted((post.get("latest_comments") or {}).values(), key=_by_timestamp)[-LATEST_COMMENTS_SIZE:]
+
+
+def _comment_update(comment, latest=None):
+    """The announcement update that counts ``comment`` and rotates the preview"""
+    update = {
+        "comment_count": Increment(1),
+        _latest_field(comment["id"]): comment,
+        # Lets the local mirror pick up the new count
+        "last_updated": datetime.now(),
+    }
+    known = sorted((c for c in latest or [] if c.get("id") != comment["id"]), key=_by_timestamp)
+    for stale in known[:max(len(known) - (LATEST_COMMENTS_SIZE - 1), 0)]:
+        update[_latest_field(stale["id"])] = DELETE_FIELD
+    return update
+
+
+def comment_ops(announcement_id, comment, latest=None):
+    """The write-queue operations that add a comment, see ``append_comment``"""
+    return [
+        create_op(f"announcements/{announcement_id}/comments/{comment['id']}", comment),
+        update_op(f"announcements/{announcement_id}", _comment_update(comment, latest)),
+    ]
+
+
+def append_comment(firestore_db, announcement_id, comment, latest=None, max_attempts=5, base_delay=0.1):
+    """Add a comment to an announcement's thread.
+
+    The comment document, the ``comment_count`` increment and the preview
+    entry are written in one batch without reading the announcement, so
+    concurrent commenters never overwrite each other. Each writer drops
+    the preview entries it knows are no longer among the latest, given as
+    ``latest``. Contention errors are retried with jittered exponential
+    backoff, and a retry of a batch that did commit is recognised by the
+    comment document already existing.
+    """
+    doc_ref = firestore_db.collection("announcements").document(announcement_id)
+    comment_ref = _comments_ref(firestore_db, announcement_id).document(comment["id"])
+
+    update = _comment_update(comment, latest)
+
+    for attempt in range(max_attempts):
+        batch = firestore_db.batch()
+        batch.create(comment_ref, comment)
+        batch.update(doc_ref, update)
+        try:
+            batch.commit()
+            return
+        except gcp_exceptions.AlreadyExists:
+            return
+        except RETRYABLE_ERRORS:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(base_delay * (2 ** attempt) * (1 + random.random()))
+
+
+def load_comments(firestore_db, announcement_id, legacy=False):
+    """Return an announcement's full comment thread, oldest first.
+
+    ``legacy`` also reads the ``comments`` array announcements embedded
+    before the thread moved to a subcollection.
+    """
+    comments = [doc.to_dict() for doc in _comments_ref(firestore_db, announcement_id).order_by("timestamp").stream()]
+    if legacy:
+        snapshot = firestore_db.collection("announcements").document(announcement_id).get(field_paths=["comments"])
+        embedded = (snapshot.to_dict() or {}).get("comments", []) if snapshot.exists else []
+        seen = {comment.get("id") for comment in comments}
+        comments = sorted(
+            [comment for comment in embedded if comment.get("id") not in seen] + comments,
+            key=_by_timestamp,
+        )
+    return comments
+
+
+def migrate_announcement(firestore_db, announcement_id):
+    """Move an embedded ``comments`` array into the thread subcollection.
+
+    Returns the number of comments moved. The count is incremented rather
+    than set, so comments posted meanwhile are still counted, and a rerun
+    after a partial failure rewrites the same comment documents.
+    """
+    doc_ref = firestore_db.collection("announcements").document(announcement_id)
+    snapshot = doc_ref.get(field_paths=["comments"])
+    embedded = (snapshot.to_dict() or {}).get("comments") if snapshot.exists else None
+    if embedded is None:
+        return 0
+
+    # Comments from before ids were assigned get one derived from their position
+    embedded = [
+        dict(comment, id=comment.get("id") or f"{announcement_id}-{position}")
+        for position, comment in enumerate(embedded)
+    ]
+    comments_ref = _comments_ref(firestore_db, announcement_id)
+    for start in range(0, len(embedded), MAX_BATCH_WRITES):
+        batch = firestore_db.batch()
+        for comment in embedded[start:start + MAX_BATCH_WRITES]:
+            batch.set(comments_ref.document(comment["id"]), comment)
+        batch.commit()
+
+    update = {"comments": DELETE_FIELD, "comment_count": Increment(len(embedded)), "last_updated": datetime.now()}
+    for comment in sorted(embedded, key=_by_timestamp)[-LATEST_COMMENTS_SIZE:]:
+        update[_latest_field(comment["id"])] = comment
+    doc_ref.update(update)
+    return len(embedded)
+
+
+def migrate_announcements(firestore_db):
+    """Migrate every announcement; returns (announcements migrated, comments moved)"""
+    migrated = moved = 0
+    for doc_ref in firestore_db.collection("announcements").list_documents():
+        count = migrate_announcement(firestore_db, doc_ref.id)
+        if count:
+            migrated += 1
+            moved += count
+    return migrated, moved
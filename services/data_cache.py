@@ -0,0 +1,172 @@
+import threading
+import time
+
+import streamlit as st
+
+from services.cache_backend import LocalBackend, get_cache_backend
+from services.single_flight import SingleFlight, get_single_flight
+from services.write_queue import commit_action
+
+DOCUMENT_TTL_SECONDS = 600
+
+
+def document_key(collection, document_id):
+    """Cache key for a document, e.g. ``users/{uid}``"""
+    return f"{collection}/{document_id}"
+
+
+class DocumentCache:
+    """Process-wide cache of Firestore documents keyed by document path.
+
+    Each entry is stamped with the document's ``update_time`` so an older
+    snapshot never replaces a newer one, and writes invalidate only the
+    paths they touched. Every key also carries a generation counter that
+    changes on invalidation, which lets per-session caches notice that an
+    entry they copied is out of date without a backend read.
+
+    Entries are also kept in a cache backend shared with the app's other
+    processes, which are told about invalidations through it. Sessions
+    missing the same documents at the same time share one read.
+    """
+
+    NAMESPACE = "documents"
+
+    def __init__(self, ttl=DOCUMENT_TTL_SECONDS, backend=None, single_flight=None):
+        self._ttl = ttl
+        self._backend = backend or LocalBackend()
+        self._single_flight = single_flight or SingleFlight()
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (data, update_time, fetched_at)
+        self._generations = {}
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0, "stale_puts": 0}
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and time.time() - entry[2] < self._ttl
+
+    def _drop_remote_invalidations(self):
+        keys = self._backend.invalidations(self.NAMESPACE)
+        if keys:
+            self._invalidate_local(keys)
+
+    def generation(self, key):
+        """Return the current generation of a key"""
+        self._drop_remote_invalidations()
+        return self._generations.get(key, 0)
+
+    def _store(self, key, data, update_time, fetched_at, generation=None):
+        """Keep a document in memory unless a newer version is cached or, given the
+        generation it was read at, the key was invalidated since"""
+        with self._lock:
+            if generation is not None and self._generations.get(key, 0) != generation:
+                self.stats["stale_puts"] += 1
+                return False
+            entry = self._entries.get(key)
+            if entry is not None and update_time is not None and entry[1] is not None \
+                    and update_time < entry[1]:
+                self.stats["stale_puts"] += 1
+                return False
+            if entry is None or entry[1] != update_time:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries[key] = (data, update_time, fetched_at)
+            return True
+
+    def put(self, key, data, update_time=None):
+        """Store a document unless a newer version is already cached"""
+        fetched_at = time.time()
+        if self._store(key, data, update_time, fetched_at):
+            self._backend.set_many(self.NAMESPACE, {key: [data, update_time, fetched_at]}, self._ttl)
+
+    def _invalidate_local(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self.stats["invalidations"] += 1
+
+    def invalidate(self, *keys):
+        """Drop cached documents here and in every other process"""
+        self._invalidate_local(keys)
+        self._backend.delete_many(self.NAMESPACE, keys)
+
+    def get_many(self, firestore_db, collection, document_ids):
+        """Return document id -> data, fetching every uncached document in one get_all call"""
+        self._drop_remote_invalidations()
+        keys = {document_id: document_key(collection, document_id) for document_id in document_ids if document_id}
+        with self._lock:
+            missing = [document_id for document_id, key in keys.items() if not self._fresh(key)]
+            self.stats["hits"] += len(keys) - len(missing)
+
+        if missing:
+            # Another process may have fetched them already
+            shared = self._backend.get_many(self.NAMESPACE, [keys[document_id] for document_id in missing])
+            for key, (data, update_time, fetched_at) in shared.items():
+                self._store(key, data, update_time, fetched_at)
+            missing = [document_id for document_id in missing if keys[document_id] not in shared]
+            with self._lock:
+                self.stats["shared_hits"] += len(shared)
+                self.stats["misses"] += len(missing)
+
+        if missing:
+            ids = {(self.NAMESPACE, keys[document_id]): document_id for document_id in missing}
+
+            def fetch(fetch_keys):
+                # A save invalidating a key while it is read may land after the read saw the old version
+                token = self._backend.read_token()
+                with self._lock:
+                    generations = {key: self._generations.get(key, 0) for _, key in fetch_keys}
+                collection_ref = firestore_db.collection(collection)
+                refs = [collection_ref.document(ids[key]) for key in fetch_keys]
+                fetched, stored = {}, {}
+                fetched_at = time.time()
+                for doc in firestore_db.get_all(refs):
+                    # Missing documents are cached too so they are not re-read every rerun
+                    key = keys[doc.id]
+                    data, update_time = doc.to_dict() if doc.exists else {}, getattr(doc, "update_time", None)
+                    fetched[key] = [data, update_time, fetched_at]
+                    if self._store(key, data, update_time, fetched_at, generation=generations[key]):
+                        stored[key] = fetched[key]
+                self._backend.set_many(self.NAMESPACE, stored, self._ttl, since=token)
+                return {(self.NAMESPACE, key): entry for key, entry in fetched.items()}
+
+            # Documents another session is already fetching are waited for, not re-read
+            results = self._single_flight.do_many(list(ids), fetch)
+        else:
+            results = {}
+
+        with self._lock:
+            found = {
+                document_id: self._entries[key][0]
+                for document_id, key in keys.items()
+                if key in self._entries
+            }
+        # A read that raced an invalidation is handed out once but not cached
+        for fetch_key, (data, _, _) in results.items():
+            found.setdefault(ids[fetch_key], data)
+        return found
+
+    def get(self, firestore_db, collection, document_id):
+        """Return a single document's data, or an empty dict if it does not exist"""
+        return self.get_many(firestore_db, collection, [document_id]).get(document_id, {})
+
+    def get_stats(self):
+        """Return hit/miss counters and the hit rate"""
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["shared_hits"]
+            lookups = hits + self.stats["misses"]
+            return dict(
+                self.stats,
+                entries=len(self._entries),
+                hit_rate=hits / lookups if lookups else 0.0,
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def get_document_cache():
+    """Return the process-wide document cache"""
+    return DocumentCache(backend=get_cache_backend(), single_flight=get_single_flight())
+
+
+@commit_action("invalidate_documents")
+def _invalidate_committed(*keys):
+    get_document_cache().invalidate(*keys)
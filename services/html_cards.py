@@ -0,0 +1,170 @@
+import base64
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from html import escape
+
+import streamlit as st
+
+FRAGMENT_CACHE_SIZE = 5000
+
+MEMBER_CARDS_CSS = """
+<style>
+.bh-members{display:grid;grid-template-columns:100px 1fr;gap:1rem 1.25rem;align-items:start}
+.bh-members img,.bh-members .bh-pic{width:100px;height:100px;object-fit:cover;border-radius:8px}
+.bh-members h3{margin:0 0 .25rem 0;padding:0}
+.bh-members p{margin:.1rem 0}
+.bh-members hr{grid-column:1/-1;margin:.25rem 0;border:none;border-top:1px solid rgba(128,128,128,.3)}
+</style>
+"""
+
+COMMENTS_CSS = """
+<style>
+.bh-comments{display:grid;grid-template-columns:50px 1fr;gap:.5rem .75rem;align-items:start}
+.bh-comments img,.bh-comments .bh-pic{width:50px;height:50px;object-fit:cover;border-radius:50%}
+.bh-comments p{margin:0;white-space:pre-wrap}
+.bh-comments small{opacity:.6}
+</style>
+"""
+
+
+class FragmentCache:
+    """Process-wide LRU of rendered HTML, one entry per item version"""
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return html
+            self.stats["misses"] += 1
+        html = render()
+        with self._lock:
+            self._entries[key] = html
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+
+@st.cache_resource(show_spinner=False)
+def get_fragment_cache():
+    """Return the process-wide HTML fragment cache"""
+    return FragmentCache()
+
+
+@lru_cache(maxsize=16)
+def _local_image_src(path):
+    """Inline a bundled image, the browser cannot load it by path"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return ""
+    content_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def _is_remote(url):
+    return url.startswith(("http://", "https://", "data:"))
+
+
+def _local_image_class(path):
+    return "bh-local-" + hashlib.sha1(path.encode("utf-8")).hexdigest()[:10]
+
+
+def _image_html(url):
+    """An <img> for a remote url; bundled images are drawn by a shared CSS class"""
+    if url and _is_remote(url):
+        # Signed urls are reused until near expiry and shared across replicas, so the browser caches them
+        return f'<img src="{escape(url)}" alt="">'
+    return f'<div class="bh-pic {_local_image_class(url or "")}"></div>'
+
+
+def _local_images_css(urls):
+    """Inline each bundled image once per block instead of once per item"""
+    rules = [
+        f".{_local_image_class(url)}{{background:url({_local_image_src(url)}) center/cover}}"
+        for url in sorted({url for url in urls if url and not _is_remote(url)})
+    ]
+    return f"<style>{''.join(rules)}</style>" if rules else ""
+
+
+def _member_card_html(card, picture):
+    lines = [
+        _image_html(picture),
+        "<div>",
+        f"<h3>{escape(card['name'])}</h3>",
+        f"<p><b>{escape(card['role'])}</b> — {escape(card['position'])} at {escape(card['company'])}</p>",
+        f"<p>📧 <b>Email:</b> {escape(card['email'])}</p>",
+        f"<p>📞 <b>Phone:</b> {escape(card['phone'])}</p>",
+        f"<p>🌍 <b>Location:</b> {escape(card['city'])}, {escape(card['country'])}</p>",
+    ]
+    if card["skills"]:
+        lines.append(f"<p>🛠️ <b>Skills:</b> {escape(card['skills'])}</p>")
+    if card["bio"]:
+        bio = card["bio"][:200] + ("..." if len(card["bio"]) > 200 else "")
+        lines.append(f"<p>📝 <b>Bio:</b> {escape(bio)}</p>")
+    lines += ["</div>", "<hr>"]
+    return "".join(lines)
+
+
+def render_member_cards(cards, pictures):
+    """Render member cards as one HTML grid.
+
+    ``pictures`` holds each card's image url, in order. A card's HTML
+    is reused while its document ``update_time`` and picture are
+    unchanged.
+    """
+    cache = get_fragment_cache()
+    fragments = [
+        cache.get_or_render(
+            ("member", card.get("id"), card.get("version"), picture),
+            lambda card=card, picture=picture: _member_card_html(card, picture),
+        )
+        for card, picture in zip(cards, pictures)
+    ]
+    st.html(MEMBER_CARDS_CSS + _local_images_css(pictures) + '<div class="bh-members">' + "".join(fragments) + "</div>")
+
+
+def _comment_html(author, picture, text, timestamp):
+    if hasattr(timestamp, "strftime"):
+        timestamp = timestamp.strftime("%b %d, %Y %H:%M")
+    return (
+        _image_html(picture)
+        + f"<div><p><b>{escape(author)}</b>: {escape(text)}</p>"
+        + (f"<small>{escape(timestamp)}</small>" if isinstance(timestamp, str) and timestamp else "")
+        + "</div>"
+    )
+
+
+def render_comments(comments):
+    """Render ``(comment, author, picture)`` rows as one HTML grid.
+
+    Comments never change once posted, so a comment's HTML is reused
+    while its author's name and picture stay the same.
+    """
+    cache = get_fragment_cache()
+    fragments = [
+        cache.get_or_render(
+            ("comment", comment.get("id") or comment.get("text"), str(comment.get("timestamp")), author, picture),
+            lambda comment=comment, author=author, picture=picture: _comment_html(
+                author, picture, comment.get("text", ""), comment.get("timestamp")
+            ),
+        )
+        for comment, author, picture in comments
+    ]
+    pictures = [picture for _, _, picture in comments]
+    st.html(COMMENTS_CSS + _local_images_css(pictures) + '<div class="bh-comments">' + "".join(fragments) + "</div>")
@@ -0,0 +1,246 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import streamlit as st
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "images")
+DEFAULT_DISK_BUDGET_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+# Revalidate with the origin after this long when it sent no max-age
+DEFAULT_MAX_AGE_SECONDS = 3600
+# Fetches run while a page renders, so a slow origin must not hold it up
+FETCH_TIMEOUT_SECONDS = 2
+# After a failed fetch, the url is not tried again for this long
+FAILURE_TTL_SECONDS = 60
+FAILURE_CACHE_SIZE = 1024
+
+# Query parameters that only carry a URL signature, not the image identity
+_SIGNATURE_PARAMS = re.compile(r"^(x-goog-.*|expires|googleaccessid|signature)$", re.IGNORECASE)
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_key(url):
+    """Key a url by the image it points at, ignoring signed-url parameters"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not _SIGNATURE_PARAMS.match(k)]
+    normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """Two-tier LRU cache for remote images.
+
+    Recently used images are kept in memory; everything else lives on disk
+    within a byte budget, evicting the least recently used files first.
+    Stale entries are revalidated with If-None-Match / If-Modified-Since so
+    unchanged images are never downloaded twice. A url that failed to
+    fetch is not retried for ``failure_ttl`` seconds.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, disk_budget=DEFAULT_DISK_BUDGET_BYTES,
+                 memory_budget=DEFAULT_MEMORY_BUDGET_BYTES, timeout=FETCH_TIMEOUT_SECONDS,
+                 failure_ttl=FAILURE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.disk_budget = disk_budget
+        self.memory_budget = memory_budget
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (data, meta)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._failures = OrderedDict()  # key -> time a fetch may be tried again
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "evictions": 0,
+            "errors": 0,
+            "failure_hits": 0,
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_disk_index()
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".bin", base + ".json"
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from file modification times"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".bin"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key):
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        os.utime(data_path)
+        return data, meta
+
+    def _write_disk(self, key, data, meta):
+        data_path, meta_path = self._paths(key)
+        tmp_path = data_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, data_path)
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.disk_budget and len(self._disk) > 1:
+            old_key, old_size = self._disk.popitem(last=False)
+            self._disk_bytes -= old_size
+            self.stats["evictions"] += 1
+            for path in self._paths(old_key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _remember(self, key, data, meta):
+        """Put an entry in the memory tier, evicting old ones past the budget"""
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[0])
+        if len(data) > self.memory_budget:
+            return
+        self._memory[key] = (data, meta)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_budget:
+            _, (old_data, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_data)
+
+    def _fetch(self, url, meta=None):
+        """Download url, revalidating against ``meta`` when given"""
+        request = urllib.request.Request(url, headers={"User-Agent": "beerhaus-image-cache"})
+        if meta:
+            if meta.get("etag"):
+                request.add_header("If-None-Match", meta["etag"])
+            if meta.get("last_modified"):
+                request.add_header("If-Modified-Since", meta["last_modified"])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and meta:
+                return None, dict(meta, fetched_at=time.time())
+            raise
+
+        max_age = _MAX_AGE.search(headers.get("Cache-Control", ""))
+        return data, {
+            "content_type": headers.get_content_type(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "max_age": int(max_age.group(1)) if max_age else DEFAULT_MAX_AGE_SECONDS,
+            "fetched_at": time.time(),
+        }
+
+    @staticmethod
+    def _is_stale(meta):
+        return time.time() - meta.get("fetched_at", 0) > meta.get("max_age", DEFAULT_MAX_AGE_SECONDS)
+
+    def get(self, url):
+        """Return (data, content_type) for url, or None when it cannot be fetched"""
+        key = cache_key(url)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+            else:
+                entry = self._read_disk(key) if key in self._disk else None
+                if entry is not None:
+                    self._disk.move_to_end(key)
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, *entry)
+
+        if entry is not None and not self._is_stale(entry[1]):
+            return entry[0], entry[1]["content_type"]
+
+        with self._lock:
+            failed = self._failures.get(key, 0) > time.time()
+            if failed:
+                self.stats["failure_hits"] += 1
+        if not failed:
+            try:
+                data, meta = self._fetch(url, entry[1] if entry else None)
+            except (OSError, ValueError):
+                with self._lock:
+                    self.stats["errors"] += 1
+                    self._failures.pop(key, None)
+                    self._failures[key] = time.time() + self.failure_ttl
+                    while len(self._failures) > FAILURE_CACHE_SIZE:
+                        self._failures.popitem(last=False)
+                failed = True
+        if failed:
+            # Serve the stale copy rather than nothing if the origin is down
+            return (entry[0], entry[1]["content_type"]) if entry else None
+
+        with self._lock:
+            self._failures.pop(key, None)
+            if data is None:
+                self.stats["revalidated"] += 1
+                data = entry[0]
+            elif entry is None:
+                self.stats["misses"] += 1
+            self._write_disk(key, data, meta)
+            self._remember(key, data, meta)
+        return data, meta["content_type"]
+
+    def get_stats(self):
+        """Return hit/miss counters and current tier sizes"""
+        with self._lock:
+            return dict(
+                self.stats,
+                memory_bytes=self._memory_bytes,
+                disk_bytes=self._disk_bytes,
+                disk_entries=len(self._disk),
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def get_image_cache():
+    """Return the process-wide image cache, configured from secrets when set"""
+    from configs.firebase_config import get_setting
+    return ImageCache(
+        cache_dir=get_setting("IMAGE_CACHE_DIR", DEFAULT_CACHE_DIR),
+        disk_budget=int(get_setting("IMAGE_CACHE_DISK_BYTES", DEFAULT_DISK_BUDGET_BYTES)),
+        memory_budget=int(get_setting("IMAGE_CACHE_MEMORY_BYTES", DEFAULT_MEMORY_BUDGET_BYTES)),
+    )
+
+
+def cached_image_src(url):
+    """Return a data URI for a remote image, for use in raw <img> tags"""
+    if not url or not url.startswith(("http://", "https://")):
+        return url
+    result = get_image_cache().get(url)
+    if not result:
+        return url
+    data, content_type = result
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
@@ -0,0 +1,193 @@
+import hashlib
+import io
+import time
+from datetime import datetime, timezone
+from urllib.parse import unquote, urlsplit
+
+from google.api_core.exceptions import NotFound
+from PIL import Image, ImageOps, features
+
+from configs.firebase_config import get_firestore, get_storage
+from services.signed_urls import get_signed_url_manager
+from services.write_queue import commit_action, get_write_queue
+
+# Square avatar variants, in pixels: comments (50px), members (100px), profile (300px)
+PROFILE_PIC_SIZES = (64, 128, 320)
+
+WEBP_SUPPORTED = features.check("webp")
+PROFILE_PIC_EXTENSION = "webp" if WEBP_SUPPORTED else "jpg"
+
+# Attempts at deleting a replaced picture before giving up on it
+DELETE_ATTEMPTS = 3
+DELETE_RETRY_SECONDS = 0.2
+
+
+def _encode(image):
+    """Encode an image as WebP, or JPEG when Pillow was built without WebP"""
+    buffer = io.BytesIO()
+    if WEBP_SUPPORTED:
+        image.save(buffer, format="WEBP", quality=80, method=4)
+        return buffer.getvalue(), "image/webp", PROFILE_PIC_EXTENSION
+    image.save(buffer, format="JPEG", quality=82, optimize=True, progressive=True)
+    return buffer.getvalue(), "image/jpeg", PROFILE_PIC_EXTENSION
+
+
+def make_profile_pic_variants(file, sizes=PROFILE_PIC_SIZES):
+    """Create square, auto-oriented, EXIF-free variants of an uploaded picture.
+
+    Returns a dict of size -> (data, content_type, extension).
+    """
+    with Image.open(file) as original:
+        # Apply the EXIF orientation before it is dropped on re-encode
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    variants = {}
+    for size in sizes:
+        resized = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+        variants[size] = _encode(resized)
+    return variants
+
+
+def upload_profile_pic_variants(storage_bucket, user_id, file, sizes=PROFILE_PIC_SIZES):
+    """Upload every variant of a profile picture and return size -> blob path.
+
+    Blobs are named after a hash of the uploaded bytes, so uploading a
+    picture the member already has costs one listing and no transfer.
+    Reused blobs are touched, which restarts the blob GC's grace period
+    for them.
+    """
+    data = file.getvalue()
+    base_name = f"profile_pics/{user_id}_{hashlib.sha256(data).hexdigest()[:32]}"
+    paths = {str(size): f"{base_name}_{size}.{PROFILE_PIC_EXTENSION}" for size in sizes}
+    stored = {
+        blob.name: blob for blob in storage_bucket.list_blobs(prefix=f"{base_name}_")
+        if blob.name in paths.values()
+    }
+    for blob in stored.values():
+        blob.metadata = {"last_used": datetime.now(timezone.utc).isoformat()}
+        blob.patch()
+    if len(stored) == len(paths):
+        return paths
+
+    for size, (encoded, content_type, _) in make_profile_pic_variants(io.BytesIO(data), sizes).items():
+        if paths[str(size)] in stored:
+            continue
+        blob = storage_bucket.blob(paths[str(size)])
+        # Content-addressed names never change content, so caches may keep them forever
+        blob.cache_control = "public, max-age=31536000, immutable"
+        blob.upload_from_string(encoded, content_type=content_type)
+    return paths
+
+
+def delete_profile_pics(storage_bucket, paths, attempts=DELETE_ATTEMPTS):
+    """Delete replaced picture blobs, retrying failures; returns the paths left behind"""
+    remaining = set(paths)
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(DELETE_RETRY_SECONDS * 2 ** attempt)
+        for path in list(remaining):
+            try:
+                storage_bucket.blob(path).delete()
+            except NotFound:
+                pass
+            except Exception as e:
+                print(f"Could not delete old pic {path}: {e}")
+                continue
+            remaining.discard(path)
+        if not remaining:
+            break
+    return remaining
+
+
+@commit_action("delete_replaced_pictures")
+def delete_replaced_pictures(user_id, paths):
+    """Delete pictures a committed profile save replaced, unless the member points at them again"""
+    # A later save, committed or queued in this process, may have gone back to one of them
+    snapshot = get_firestore().collection("users").document(user_id).get(
+        field_paths=["profile_pic_path", "profile_pic_variants", "profile_pic_url"]
+    )
+    current = get_write_queue().overlay(f"users/{user_id}", snapshot.to_dict())
+    unreferenced = set(paths) - profile_pic_paths(current or {})
+    left = delete_profile_pics(get_storage(), unreferenced)
+    if left:
+        print(f"Could not delete replaced pictures of {user_id}: {sorted(left)}")
+    get_signed_url_manager().invalidate(unreferenced - left)
+
+
+def blob_path_from_url(url):
+    """Return the blob path a Cloud Storage url, signed or not, points at; None for other urls.
+
+    Raises ValueError for a url that looks like one of the bucket's but
+    has no readable blob path.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    path = ""
+    if host == "firebasestorage.googleapis.com":
+        # /v0/b/{bucket}/o/{quoted blob path}
+        path = parts.path.partition("/o/")[2]
+    elif host in ("storage.googleapis.com", "storage.cloud.google.com"):
+        # /{bucket}/{quoted blob path}
+        path = parts.path.lstrip("/").partition("/")[2]
+    elif host.endswith(".storage.googleapis.com"):
+        path = parts.path.lstrip("/")
+    elif "profile_pics" not in url:
+        return None
+    if not path:
+        raise ValueError(f"No blob path in url {url[:100]}")
+    return unquote(path)
+
+
+def profile_pic_paths(profile, strict=False):
+    """Return every blob path a profile references.
+
+    Older documents only reference their picture through signed urls,
+    whose blob paths are read back. An unreadable url is skipped, or
+    raises ValueError with ``strict``.
+    """
+    paths = {profile.get('profile_pic_path')}
+    paths.update(_variant_paths(profile).values())
+    legacy_urls = [value for value in (profile.get('profile_pic_variants') or {}).values() if "://" in value]
+    if profile.get('profile_pic_url'):
+        legacy_urls.append(profile['profile_pic_url'])
+    for url in legacy_urls:
+        try:
+            paths.add(blob_path_from_url(url))
+        except ValueError:
+            if strict:
+                raise
+    paths.discard(None)
+    paths.discard("")
+    return paths
+
+
+def _variant_paths(profile):
+    # Older documents stored signed urls here instead of blob paths
+    variants = profile.get('profile_pic_variants') or {}
+    return {size: value for size, value in variants.items() if "://" not in value}
+
+
+def pick_profile_pic_path(profile, width):
+    """Return the blob path of the smallest variant at least ``width`` pixels wide"""
+    variants = _variant_paths(profile)
+    for size in sorted(int(size) for size in variants):
+        if size >= width:
+            return variants[str(size)]
+    if variants:
+        return variants[str(max(int(size) for size in variants))]
+    return profile.get('profile_pic_path') or None
+
+
+def pick_profile_pic(profile, width, default=None):
+    """Return a url for the smallest stored variant at least ``width`` pixels wide"""
+    path = pick_profile_pic_path(profile, width)
+    if path:
+        return get_signed_url_manager().get_url(path)
+
+    # Legacy documents only carry permanently signed urls
+    variants = {size: url for size, url in (profile.get('profile_pic_variants') or {}).items()
+                if "://" in url}
+    for size in sorted(int(size) for size in variants):
+        if size >= width:
+            return variants[str(size)]
+    return profile.get('profile_pic_url') or default
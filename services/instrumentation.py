@@ -0,0 +1,307 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Client methods that reach the backend and are counted and timed
+TRACED_METHODS = {
+    "get": "get",
+    "get_all": "get_all",
+    "stream": "stream",
+    "set": "set",
+    "update": "update",
+    "add": "add",
+    "delete": "delete",
+    "on_snapshot": "listen",
+    "commit": "commit",
+    "upload_from_file": "upload",
+    "upload_from_string": "upload",
+    "download_as_bytes": "download",
+    "exists": "exists",
+    "list_blobs": "list",
+    "generate_signed_url": "sign",
+    "create_user": "create_user",
+    "get_user": "get_user",
+    "get_user_by_email": "get_user_by_email",
+    "create_session_cookie": "create_session",
+}
+
+# Methods returning lazy iterators; their time includes consuming the results
+STREAMING_METHODS = {"stream", "get_all"}
+
+# Results exposing any of these are references, queries or blobs and get traced too
+_TRACEABLE_ATTRIBUTES = ("stream", "set", "upload_from_string", "generate_signed_url")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Sessions end without telling us, so only the most recently rerun ones keep per-rerun totals
+MAX_RERUN_SESSIONS = 1000
+
+
+class Metrics:
+    """Process-wide backend call counters and latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)  # (backend, op, view) -> count
+        self.errors = defaultdict(int)  # (backend, op, view) -> count
+        self.buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))  # (backend, op) -> counts
+        self.seconds = defaultdict(float)  # (backend, op) -> total seconds
+        self.observed = defaultdict(int)  # (backend, op) -> count
+        self._reruns = OrderedDict()  # session id -> {(backend, op, view): [count, seconds]}, oldest first
+
+    def record(self, backend, op, view, seconds, failed=False):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        with self._lock:
+            self.calls[(backend, op, view)] += 1
+            if failed:
+                self.errors[(backend, op, view)] += 1
+            counts = self.buckets[(backend, op)]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+            self.seconds[(backend, op)] += seconds
+            self.observed[(backend, op)] += 1
+            if ctx is not None and ctx.session_id in self._reruns:
+                entry = self._reruns[ctx.session_id].setdefault((backend, op, view), [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+
+    def begin_rerun(self):
+        """Start collecting per-rerun totals for the current session"""
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            with self._lock:
+                self._reruns.pop(ctx.session_id, None)
+                self._reruns[ctx.session_id] = {}
+                while len(self._reruns) > MAX_RERUN_SESSIONS:
+                    self._reruns.popitem(last=False)
+
+    def rerun_totals(self):
+        """Return ``(backend, op, view, count, seconds)`` rows for the current rerun"""
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            return []
+        with self._lock:
+            totals = dict(self._reruns.get(ctx.session_id, {}))
+        return sorted(
+            (backend, op, view, count, seconds)
+            for (backend, op, view), (count, seconds) in totals.items()
+        )
+
+    def prometheus_text(self):
+        """Render cumulative counters and histograms in the Prometheus text format"""
+        with self._lock:
+            calls = dict(self.calls)
+            errors = dict(self.errors)
+            buckets = {key: list(counts) for key, counts in self.buckets.items()}
+            seconds = dict(self.seconds)
+            observed = dict(self.observed)
+
+        lines = [
+            "# HELP beerhaus_backend_calls_total Backend calls by operation and issuing view.",
+            "# TYPE beerhaus_backend_calls_total counter",
+        ]
+        for (backend, op, view), count in sorted(calls.items()):
+            lines.append(f'beerhaus_backend_calls_total{{backend="{backend}",op="{op}",view="{view}"}} {count}')
+        lines += [
+            "# HELP beerhaus_backend_errors_total Backend calls that raised.",
+            "# TYPE beerhaus_backend_errors_total counter",
+        ]
+        for (backend, op, view), count in sorted(errors.items()):
+            lines.append(f'beerhaus_backend_errors_total{{backend="{backend}",op="{op}",view="{view}"}} {count}')
+        lines += [
+            "# HELP beerhaus_backend_call_seconds Backend call latency.",
+            "# TYPE beerhaus_backend_call_seconds histogram",
+        ]
+        for (backend, op), counts in sorted(buckets.items()):
+            labels = f'backend="{backend}",op="{op}"'
+            for bound, count in zip(LATENCY_BUCKETS, counts):
+                lines.append(f'beerhaus_backend_call_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'beerhaus_backend_call_seconds_bucket{{{labels},le="+Inf"}} {observed[(backend, op)]}')
+            lines.append(f'beerhaus_backend_call_seconds_sum{{{labels}}} {seconds[(backend, op)]:.6f}')
+            lines.append(f'beerhaus_backend_call_seconds_count{{{labels}}} {observed[(backend, op)]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _calling_view():
+    """Name the innermost view (or else service) function on the current stack"""
+    frame = sys._getframe(2)
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("Views."):
+            return f"{module}.{frame.f_code.co_name}"
+        if fallback is None and module.startswith("services.") and module != __name__:
+            fallback = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+def _unwrap(value):
+    if isinstance(value, Traced):
+        return object.__getattribute__(value, "_target")
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+
+def _maybe_wrap(value, backend):
+    if any(hasattr(value, attribute) for attribute in _TRACEABLE_ATTRIBUTES) and not isinstance(value, Traced):
+        return Traced(value, backend)
+    return value
+
+
+def _timed_iterator(iterator, backend, op, view, start):
+    failed = False
+    try:
+        yield from iterator
+    except Exception:
+        failed = True
+        raise
+    finally:
+        metrics.record(backend, op, view, time.perf_counter() - start, failed)
+
+
+class Traced:
+    """Transparent proxy that counts and times backend calls on a client.
+
+    References, queries and blobs returned by the client are traced too,
+    and proxies are unwrapped before being handed back to the library.
+    """
+
+    def __init__(self, target, backend):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_backend", backend)
+
+    def __getattr__(self, name):
+        target = object.__getattribute__(self, "_target")
+        backend = object.__getattribute__(self, "_backend")
+        attribute = getattr(target, name)
+        if not callable(attribute) or isinstance(attribute, type):
+            return attribute
+
+        op = TRACED_METHODS.get(name)
+
+        def call(*args, **kwargs):
+            args = _unwrap(args)
+            kwargs = {key: _unwrap(value) for key, value in kwargs.items()}
+            if op is None:
+                return _maybe_wrap(attribute(*args, **kwargs), backend)
+
+            view = _calling_view()
+            start = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception:
+                metrics.record(backend, op, view, time.perf_counter() - start, failed=True)
+                raise
+            if name in STREAMING_METHODS:
+                return _timed_iterator(result, backend, op, view, start)
+            metrics.record(backend, op, view, time.perf_counter() - start)
+            return _maybe_wrap(result, backend)
+
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(object.__getattribute__(self, "_target"), name, value)
+
+    def __repr__(self):
+        return f"Traced({object.__getattribute__(self, '_target')!r})"
+
+
+def instrument(client, backend):
+    """Wrap a Firestore client, Auth module or Storage bucket for tracing"""
+    return Traced(client, backend)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def start_metrics_server(port):
+    """Serve the Prometheus export on ``port`` from a background thread, once per process"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="beerhaus-metrics", daemon=True).start()
+    return _server
+
+
+def _secret(name, default=None):
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+def debug_panel_enabled():
+    """Whether the per-rerun backend debug panel is switched on in secrets"""
+    return bool(_secret("DEBUG_PANEL", False))
+
+
+def start_configured_metrics_server():
+    """Start the Prometheus endpoint when METRICS_PORT is set in secrets"""
+    port = _secret("METRICS_PORT")
+    if port:
+        start_metrics_server(int(port))
+
+
+def render_debug_panel():
+    """Show this rerun's backend calls and cache stats in the sidebar"""
+    if not debug_panel_enabled():
+        return
+
+    from services.cache_backend import get_cache_backend
+    from services.data_cache import get_document_cache
+    from services.html_cards import get_fragment_cache
+    from services.image_cache import get_image_cache
+    from services.local_mirror import get_local_mirror
+    from services.single_flight import get_single_flight
+    from services.write_queue import get_write_queue
+
+    rows = metrics.rerun_totals()
+    with st.sidebar.expander("🐞 Backend calls (this rerun)"):
+        st.caption(
+            f"{sum(row[3] for row in rows)} calls, "
+            f"{sum(row[4] for row in rows) * 1000:.1f} ms total"
+        )
+        if rows:
+            st.table([
+                {"backend": backend, "op": op, "view": view, "calls": count, "ms": round(seconds * 1000, 1)}
+                for backend, op, view, count, seconds in rows
+            ])
+        st.caption(f"Document cache: {get_document_cache().get_stats()}")
+        st.caption(f"Shared cache backend: {get_cache_backend().get_stats()}")
+        st.caption(f"Image cache: {get_image_cache().get_stats()}")
+        st.caption(f"HTML fragment cache: {get_fragment_cache().get_stats()}")
+        st.caption(f"Write queue: {get_write_queue().get_stats()}")
+        st.caption(f"Local mirror: {get_local_mirror().get_stats()}")
+        st.caption(f"Coalesced reads: {get_single_flight().get_stats()}")
+        st.download_button(
+            "Download metrics",
+            metrics.prometheus_text(),
+            file_name="metrics.txt",
+            mime="text/plain",
+        )
@@ -0,0 +1,352 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+import streamlit as st
+
+from services.single_flight import SingleFlight, get_single_flight
+from services.write_queue import commit_action, decode_value, encode_value
+
+DEFAULT_MIRROR_PATH = os.path.join(".cache", "mirror.sqlite3")
+
+# collection -> (field a write bumps, field history is ordered by)
+MIRRORED_COLLECTIONS = {
+    "users": ("last_updated", None),
+    "announcements": ("last_updated", "timestamp"),
+}
+
+SYNC_INTERVAL_SECONDS = 30
+SYNC_PAGE_SIZE = 500
+# Writers stamp ``last_updated`` with their own clock, re-read this far back
+SYNC_OVERLAP = timedelta(minutes=5)
+# Deletes are invisible to a delta sync, a full re-read picks them up
+FULL_RESYNC_SECONDS = 24 * 3600
+
+
+def _ordering(value):
+    return value.timestamp() if hasattr(value, "timestamp") else None
+
+
+class LocalMirror:
+    """Persistent SQLite replica of the ``users`` and ``announcements`` collections.
+
+    A collection is read in full once, then kept current by fetching only
+    documents whose ``last_updated`` is newer than the newest one seen
+    (the watermark). The replica survives restarts, so a new process only
+    fetches what changed while it was down. Reads are indexed SQLite
+    lookups that never reach Firestore.
+    """
+
+    def __init__(self, path, firestore_factory, collections=MIRRORED_COLLECTIONS,
+                 sync_interval=SYNC_INTERVAL_SECONDS, single_flight=None):
+        self._firestore_factory = firestore_factory
+        self._collections = dict(collections)
+        self._sync_interval = sync_interval
+        self._single_flight = single_flight or SingleFlight()
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._syncing = False
+        self._synced_once = False
+        self._last_sync = 0.0
+        self._subscribers = {}  # collection -> callbacks run with (id, data), data None once deleted
+        # collection -> id -> update_time subscribers last heard about; the file is shared with other processes
+        self._notified = {}
+        self._notify_lock = threading.Lock()
+        self.stats = {"hydrated": 0, "synced": 0, "syncs": 0, "reads": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                update_time TEXT,
+                ordering REAL,
+                PRIMARY KEY (collection, id)
+            )
+        """)
+        self._db.execute("DROP INDEX IF EXISTS documents_ordering")
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_history ON documents (collection, ordering, id)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                collection TEXT PRIMARY KEY,
+                watermark TEXT,
+                hydrated_at REAL NOT NULL
+            )
+        """)
+
+    def _row(self, collection, doc):
+        data = doc.to_dict() or {}
+        ordering_field = self._collections[collection][1]
+        return (
+            collection,
+            doc.id,
+            json.dumps(encode_value(data)),
+            json.dumps(encode_value(doc.update_time)),
+            _ordering(data.get(ordering_field)) if ordering_field else None,
+        )
+
+    def _state(self, collection):
+        with self._lock:
+            return self._db.execute(
+                "SELECT watermark, hydrated_at FROM sync_state WHERE collection = ?", (collection,)
+            ).fetchone()
+
+    def ready(self, collection):
+        """Whether a collection has been read in full at least once"""
+        return self._state(collection) is not None
+
+    def _notify_changes(self, collection):
+        """Tell subscribers what changed in the replica since they last heard, whichever process wrote it"""
+        callbacks = self._subscribers.get(collection)
+        if not callbacks:
+            return
+        with self._notify_lock:
+            with self._lock:
+                stored = dict(self._db.execute(
+                    "SELECT id, update_time FROM documents WHERE collection = ?", (collection,)
+                ))
+            notified = self._notified[collection]
+            changed = [document_id for document_id, update_time in stored.items()
+                       if notified.get(document_id) != update_time]
+            removed = notified.keys() - stored.keys()
+            documents = self.get_many(collection, changed) if changed else {}
+            self._notified[collection] = stored
+            for callback in callbacks:
+                for document_id, data in documents.items():
+                    callback(document_id, data)
+                for document_id in removed:
+                    callback(document_id, None)
+
+    def hydrate(self, collection):
+        """Replace the replica of a collection with a full read of it"""
+        field = self._collections[collection][0]
+        rows, watermark = [], None
+        for doc in self._firestore_factory().collection(collection).stream():
+            rows.append(self._row(collection, doc))
+            value = (doc.to_dict() or {}).get(field)
+            if value is not None and (watermark is None or value > watermark):
+                watermark = value
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+                self._db.executemany("INSERT INTO documents VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                    (collection, json.dumps(encode_value(watermark)), time.time()),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.stats["hydrated"] += len(rows)
+        # Including deletes, which no delta sync sees
+        self._notify_changes(collection)
+        return len(rows)
+
+    def sync(self, collection):
+        """Fetch documents changed since the watermark; returns how many"""
+        state = self._state(collection)
+        if state is None:
+            return self.hydrate(collection)
+        field = self._collections[collection][0]
+        watermark = decode_value(json.loads(state[0])) if state[0] else None
+        query = self._firestore_factory().collection(collection).order_by(field).limit(SYNC_PAGE_SIZE)
+        page = query.start_after({field: watermark - SYNC_OVERLAP}) if watermark is not None else query
+
+        changed = 0
+        while True:
+            docs = list(page.stream())
+            if not docs:
+                break
+            rows = {doc.id: self._row(collection, doc) for doc in docs}
+            with self._lock:
+                # The overlap re-reads recent documents, skip the unchanged ones
+                stored = dict(self._db.execute(
+                    f"SELECT id, update_time FROM documents WHERE collection = ? AND id IN ({','.join('?' * len(rows))})",
+                    [collection, *rows],
+                ))
+                changed_docs = [doc for doc in docs if stored.get(doc.id) != rows[doc.id][3]]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                    [rows[doc.id] for doc in changed_docs],
+                )
+                newest = docs[-1].to_dict().get(field)
+                if watermark is None or newest > watermark:
+                    watermark = newest
+                    self._db.execute(
+                        "UPDATE sync_state SET watermark = ? WHERE collection = ?",
+                        (json.dumps(encode_value(watermark)), collection),
+                    )
+            changed += len(changed_docs)
+            if len(docs) < SYNC_PAGE_SIZE:
+                break
+            page = query.start_after(docs[-1])
+        with self._lock:
+            self.stats["synced"] += changed
+            self.stats["syncs"] += 1
+        # Another process may have brought in changes this one's delta skipped past
+        self._notify_changes(collection)
+        return changed
+
+    def sync_all(self):
+        """Bring every collection up to date, re-reading stale ones in full"""
+        for collection in self._collections:
+            state = self._state(collection)
+            if state is not None and time.time() - state[1] >= FULL_RESYNC_SECONDS:
+                self.hydrate(collection)
+            else:
+                self.sync(collection)
+
+    def _sync_in_background(self):
+        with self._sync_lock:
+            if self._syncing:
+                return
+            self._syncing = True
+
+        def run():
+            try:
+                self.sync_all()
+            except Exception as e:
+                print(f"Local mirror sync failed: {e}")
+            finally:
+                with self._sync_lock:
+                    self._syncing = False
+
+        threading.Thread(target=run, name="beerhaus-mirror-sync", daemon=True).start()
+
+    def _first_sync(self):
+        if self._synced_once:
+            return
+        try:
+            self.sync_all()
+        except Exception as e:
+            # Readers fall back to Firestore for collections that never hydrated
+            print(f"Local mirror sync failed: {e}")
+        finally:
+            self._last_sync = time.time()
+            self._synced_once = True
+
+    def ensure_fresh(self):
+        """Sync when due: the first time in a process on the caller's thread, then in the background"""
+        if not self._synced_once:
+            # Sessions arriving meanwhile wait for it rather than read Firestore themselves
+            self._single_flight.do(("local_mirror", "first_sync"), self._first_sync)
+            return
+        now = time.time()
+        if now - self._last_sync < self._sync_interval:
+            return
+        with self._sync_lock:
+            self._last_sync = now
+        self._sync_in_background()
+
+    def subscribe(self, collection, callback):
+        """Call ``callback(id, data)`` for every document that changes in the replica, with None for deletes.
+
+        Changes written by other processes sharing the file are reported
+        after this process's next sync.
+        """
+        with self._notify_lock:
+            if collection not in self._notified:
+                with self._lock:
+                    self._notified[collection] = dict(self._db.execute(
+                        "SELECT id, update_time FROM documents WHERE collection = ?", (collection,)
+                    ))
+            self._subscribers.setdefault(collection, []).append(callback)
+
+    def refresh(self, collection, document_ids):
+        """Re-read documents that were just written, rather than wait for the next sync"""
+        firestore_db = self._firestore_factory()
+        collection_ref = firestore_db.collection(collection)
+        docs = list(firestore_db.get_all([collection_ref.document(document_id) for document_id in document_ids]))
+        written = [doc for doc in docs if doc.exists]
+        removed = [doc.id for doc in docs if not doc.exists]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                [self._row(collection, doc) for doc in written],
+            )
+            self._db.executemany(
+                "DELETE FROM documents WHERE collection = ? AND id = ?",
+                [(collection, document_id) for document_id in removed],
+            )
+        self._notify_changes(collection)
+
+    def get_many(self, collection, document_ids):
+        """Return id -> data for the requested documents the replica holds"""
+        document_ids = list(document_ids)
+        found = {}
+        with self._lock:
+            self.stats["reads"] += 1
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(document_ids), 500):
+                chunk = document_ids[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT id, data FROM documents WHERE collection = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [collection, *chunk],
+                ).fetchall()
+                found.update((document_id, decode_value(json.loads(data))) for document_id, data in rows)
+        return found
+
+    def documents(self, collection, after_id=None, limit=None):
+        """Yield ``(id, data, update_time)`` in document id order"""
+        with self._lock:
+            self.stats["reads"] += 1
+            rows = self._db.execute(
+                "SELECT id, data, update_time FROM documents WHERE collection = ? AND id > ? ORDER BY id LIMIT ?",
+                (collection, after_id or "", -1 if limit is None else limit),
+            ).fetchall()
+        for document_id, data, update_time in rows:
+            yield document_id, decode_value(json.loads(data)), decode_value(json.loads(update_time))
+
+    def before(self, collection, position, limit):
+        """Return up to ``limit`` documents ordered before ``(value, id)``, newest first"""
+        value, document_id = position
+        ordering = _ordering(value)
+        with self._lock:
+            self.stats["reads"] += 1
+            rows = self._db.execute(
+                "SELECT id, data FROM documents WHERE collection = ? "
+                "AND (ordering < ? OR (ordering = ? AND id < ?)) "
+                "ORDER BY ordering DESC, id DESC LIMIT ?",
+                (collection, ordering, ordering, document_id, limit),
+            ).fetchall()
+        return [(document_id, decode_value(json.loads(data))) for document_id, data in rows]
+
+    def get_stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT collection, COUNT(*) FROM documents GROUP BY collection"))
+            return dict(self.stats, documents=counts)
+
+
+def _mirror_path():
+    try:
+        return st.secrets.get("MIRROR_PATH", DEFAULT_MIRROR_PATH)
+    except Exception:
+        return DEFAULT_MIRROR_PATH
+
+
+@st.cache_resource(show_spinner=False)
+def _local_mirror():
+    from configs.firebase_config import get_firestore
+    return LocalMirror(_mirror_path(), get_firestore, single_flight=get_single_flight())
+
+
+def get_local_mirror():
+    """Return the process-wide local mirror, synced if a sync is due"""
+    mirror = _local_mirror()
+    mirror.ensure_fresh()
+    return mirror
+
+
+@commit_action("refresh_mirrored")
+def _refresh_committed(collection, document_ids):
+    _local_mirror().refresh(collection, document_ids)
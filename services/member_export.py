@@ -0,0 +1,138 @@
+import csv
+import os
+import re
+import tempfile
+import time
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+EXPORT_PAGE_SIZE = 1000
+
+# (header, field path) of every exported column
+EXPORT_COLUMNS = [
+    ("First name", "first_name"),
+    ("Last name", "last_name"),
+    ("Email", "email"),
+    ("Role", "role"),
+    ("Position", "position"),
+    ("Company", "company"),
+    ("Phone", "phone"),
+    ("City", "address.city"),
+    ("Country", "address.country"),
+    ("Skills", "skills"),
+    ("Bio", "bio"),
+]
+
+# Control characters XML, and so openpyxl, refuses in a cell
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+# Spreadsheets evaluate a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def _get_path(data, field_path):
+    for part in field_path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _row(data):
+    row = []
+    for _, field_path in EXPORT_COLUMNS:
+        value = _get_path(data, field_path)
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        if isinstance(value, str):
+            value = ILLEGAL_CHARACTERS_RE.sub("", value)
+        row.append("" if value is None else value)
+    return row
+
+
+def iter_member_rows(firestore_db, page_size=EXPORT_PAGE_SIZE):
+    """Yield one export row per member, reading ``users`` a page at a time"""
+    query = firestore_db.collection("users")\
+                        .select([field_path for _, field_path in EXPORT_COLUMNS])\
+                        .order_by(FieldPath.document_id())\
+                        .limit(page_size)
+    cursor = None
+    while True:
+        page = query.start_after(cursor) if cursor is not None else query
+        count = 0
+        for doc in page.stream():
+            count += 1
+            cursor = doc
+            yield _row(doc.to_dict())
+        if count < page_size:
+            return
+
+
+def _escape_formula(value):
+    # A leading apostrophe makes Excel show the text instead of evaluating it
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([header for header, _ in EXPORT_COLUMNS])
+        writer.writerows([_escape_formula(value) for value in row] for row in rows)
+
+
+def _write_xlsx(rows, path):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    # Write-only workbooks flush rows to disk instead of keeping every cell
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Members")
+    sheet.append([header for header, _ in EXPORT_COLUMNS])
+
+    def text(value):
+        # openpyxl stores strings starting with "=" as formulas; member text never is one
+        if not (isinstance(value, str) and value.startswith("=")):
+            return value
+        cell = WriteOnlyCell(sheet, value)
+        cell.data_type = "s"
+        return cell
+
+    for row in rows:
+        sheet.append([text(value) for value in row])
+    workbook.save(path)
+
+
+def export_members(firestore_db, export_format, page_size=EXPORT_PAGE_SIZE):
+    """Stream the member directory into a temp file.
+
+    Returns ``(path, row_count, seconds)``; the caller deletes the file.
+    """
+    extension, _ = EXPORT_FORMATS[export_format]
+    fd, path = tempfile.mkstemp(prefix="members_", suffix=f".{extension}")
+    os.close(fd)
+
+    start = time.perf_counter()
+    row_count = 0
+
+    def counted(rows):
+        nonlocal row_count
+        for row in rows:
+            row_count += 1
+            yield row
+
+    rows = counted(iter_member_rows(firestore_db, page_size))
+    try:
+        if extension == "csv":
+            _write_csv(rows, path)
+        else:
+            _write_xlsx(rows, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, row_count, time.perf_counter() - start
@@ -0,0 +1,297 @@
+import bisect
+import re
+import threading
+import time
+
+import streamlit as st
+
+from services.local_mirror import get_local_mirror
+
+# Searchable fields; a term can be limited to one with e.g. ``skills:sql``
+SEARCH_FIELDS = {
+    "name": ("first_name", "last_name"),
+    "company": ("company",),
+    "position": ("position",),
+    "city": ("address.city",),
+    "country": ("address.country",),
+    "skills": ("skills",),
+}
+
+_TOKEN = re.compile(r"[\w+#]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _get_path(data, field_path):
+    for part in field_path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _project(data, field_paths):
+    projected = {}
+    for field_path in field_paths:
+        value = _get_path(data, field_path)
+        if value is None:
+            continue
+        parts = field_path.split(".")
+        target = projected
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return projected
+
+
+def _sort_key(uid, data):
+    name = f"{data.get('first_name', '')} {data.get('last_name', '')}".strip().lower()
+    return name, uid
+
+
+class SearchResults:
+    """Matching members in display order, resolved to uids only when sliced"""
+
+    def __init__(self, ranks, uid_by_rank):
+        self._ranks = ranks
+        self._uid_by_rank = uid_by_rank
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def __getitem__(self, item):
+        # A member re-ranked by a concurrent write since the search is skipped
+        if isinstance(item, slice):
+            return [uid for uid in map(self._uid_by_rank.get, self._ranks[item]) if uid is not None]
+        return self._uid_by_rank.get(self._ranks[item])
+
+
+class MemberIndex:
+    """In-process inverted index over member name, work, location and skills.
+
+    Every token is indexed both bare and qualified by its field
+    (``sql`` and ``:skills:sql``). Tokens are kept in a sorted list so a
+    query term matches every token it is a prefix of with two bisections.
+    Postings hold each member's display rank rather than its uid, so a
+    result set is put in name order by sorting plain floats.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}  # token -> set of ranks
+        self._tokens = []  # sorted keys of _postings
+        self._member_tokens = {}  # uid -> tokens indexed for it
+        self._members = {}  # uid -> projected document
+        self._versions = {}  # uid -> update_time, or index version of the last local write
+        self._ordered = []  # sorted (name, uid) display order
+        self._rank = {}  # uid -> display rank
+        self._uid_by_rank = {}
+        self._fields = None
+        self.built = False
+        self.build_seconds = None
+        self.version = 0  # bumped on every change, for caches derived from the index
+
+    def __len__(self):
+        return len(self._members)
+
+    @staticmethod
+    def _tokens_for(data):
+        tokens = set()
+        for field, field_paths in SEARCH_FIELDS.items():
+            for field_path in field_paths:
+                value = _get_path(data, field_path)
+                if value is None:
+                    continue
+                values = value if isinstance(value, list) else [value]
+                for token in tokenize(" ".join(str(v) for v in values)):
+                    tokens.add(token)
+                    # The leading ":" keeps bare terms from prefix-matching field names
+                    tokens.add(f":{field}:{token}")
+        return tokens
+
+    def _index_postings(self):
+        postings = {}
+        for uid, tokens in self._member_tokens.items():
+            rank = self._rank[uid]
+            for token in tokens:
+                postings.setdefault(token, set()).add(rank)
+        self._postings = postings
+        self._tokens = sorted(postings)
+
+    def _renumber(self):
+        self._rank = {key[1]: float(i) for i, key in enumerate(self._ordered)}
+        self._uid_by_rank = {rank: uid for uid, rank in self._rank.items()}
+        self._index_postings()
+
+    def _add_posting(self, token, rank):
+        postings = self._postings.get(token)
+        if postings is None:
+            postings = self._postings[token] = set()
+            bisect.insort(self._tokens, token)
+        postings.add(rank)
+
+    def _remove_posting(self, token, rank):
+        postings = self._postings.get(token)
+        if postings is None:
+            return
+        postings.discard(rank)
+        if not postings:
+            del self._postings[token]
+            index = bisect.bisect_left(self._tokens, token)
+            if index < len(self._tokens) and self._tokens[index] == token:
+                del self._tokens[index]
+
+    def _unindex(self, uid):
+        rank = self._rank.pop(uid)
+        del self._uid_by_rank[rank]
+        for token in self._member_tokens.pop(uid):
+            self._remove_posting(token, rank)
+        self._versions.pop(uid, None)
+        del self._ordered[bisect.bisect_left(self._ordered, _sort_key(uid, self._members.pop(uid)))]
+
+    def build(self, documents, fields):
+        """Index every member from ``(uid, data, update_time)`` triples in one pass"""
+        start = time.perf_counter()
+        members = {}
+        versions = {}
+        member_tokens = {}
+        for uid, data, update_time in documents:
+            data = _project(data, fields)
+            members[uid] = data
+            versions[uid] = update_time
+            member_tokens[uid] = self._tokens_for(data)
+
+        with self._lock:
+            self._fields = list(fields)
+            self._members = members
+            self._versions = versions
+            self._member_tokens = member_tokens
+            self._ordered = sorted(_sort_key(uid, data) for uid, data in members.items())
+            self._renumber()
+            self.built = True
+            self.build_seconds = time.perf_counter() - start
+            self.version += 1
+
+    def update(self, uid, data):
+        """Re-index one member after a write, merging it with what is already indexed.
+
+        ``data`` of None, a deleted member, removes them.
+        """
+        if data is None:
+            self.remove(uid)
+            return
+        with self._lock:
+            if not self.built:
+                return
+            merged = dict(self._members.get(uid, {}))
+            merged.update(_project(data, self._fields))
+            if uid in self._members:
+                self._unindex(uid)
+            self.version += 1
+
+            key = _sort_key(uid, merged)
+            position = bisect.bisect_left(self._ordered, key)
+            self._ordered.insert(position, key)
+            self._members[uid] = merged
+            self._versions[uid] = self.version
+            self._member_tokens[uid] = self._tokens_for(merged)
+
+            # Rank the member halfway between its new neighbours
+            before = self._rank[self._ordered[position - 1][1]] if position > 0 else -1.0
+            after = self._rank[self._ordered[position + 1][1]] if position + 1 < len(self._ordered) else before + 2.0
+            rank = (before + after) / 2
+            if not before < rank < after:
+                # Out of float precision between neighbours, renumber everyone
+                self._renumber()
+                return
+            self._rank[uid] = rank
+            self._uid_by_rank[rank] = uid
+            for token in self._member_tokens[uid]:
+                self._add_posting(token, rank)
+
+    def remove(self, uid):
+        with self._lock:
+            if uid in self._members:
+                self._unindex(uid)
+                self.version += 1
+
+    def _prefix_matches(self, term):
+        start = bisect.bisect_left(self._tokens, term)
+        end = bisect.bisect_left(self._tokens, term + "\uffff")
+        if end - start == 1:
+            return self._postings[self._tokens[start]]
+        matches = set()
+        for token in self._tokens[start:end]:
+            matches |= self._postings[token]
+        return matches
+
+    def search(self, query):
+        """Return the members matching every term of ``query``, in display order"""
+        terms = []
+        for raw_term in query.lower().split():
+            field, _, value = raw_term.partition(":")
+            if value and field in SEARCH_FIELDS:
+                terms.extend(f":{field}:{token}" for token in tokenize(value))
+            else:
+                terms.extend(tokenize(raw_term))
+        if not terms:
+            return SearchResults([], {})
+
+        with self._lock:
+            # Intersect the most selective terms first
+            matches = sorted((self._prefix_matches(term) for term in terms), key=len)
+            result = matches[0]
+            for postings in matches[1:]:
+                result = result & postings
+                if not result:
+                    break
+            return SearchResults(sorted(result), self._uid_by_rank)
+
+    def all(self):
+        """Return every indexed member, in display order"""
+        with self._lock:
+            return SearchResults(sorted(self._uid_by_rank), self._uid_by_rank)
+
+    def get(self, uid):
+        """Return the indexed document for a member"""
+        return self._members.get(uid, {})
+
+    def version_of(self, uid):
+        """Return a value that changes whenever a member's indexed document does"""
+        return self._versions.get(uid)
+
+
+@st.cache_resource(show_spinner=False)
+def _member_index():
+    return MemberIndex()
+
+
+_build_lock = threading.Lock()
+
+
+def get_member_index(firestore_db, fields):
+    """Return the process-wide member index, building it on first use.
+
+    The index is built from the local mirror when it holds the members,
+    and then follows the mirror's syncs, otherwise from one Firestore
+    stream.
+    """
+    index = _member_index()
+    if not index.built:
+        with _build_lock:
+            if not index.built:
+                mirror = get_local_mirror()
+                if mirror.ready("users"):
+                    index.build(mirror.documents("users"), fields)
+                    mirror.subscribe("users", index.update)
+                else:
+                    docs = firestore_db.collection("users").select(fields).stream()
+                    index.build(((doc.id, doc.to_dict(), doc.update_time) for doc in docs), fields)
+    return index
+
+
+def index_member(uid, data):
+    """Keep the index current after a profile write; a no-op until it is built"""
+    _member_index().update(uid, data)
@@ -0,0 +1,68 @@
+import importlib
+import time
+
+import streamlit as st
+
+from configs import firebase_config
+
+# Page name -> (view module, render function). Modules are imported on first visit.
+PAGES = {
+    "Home": ("Views.home", "show_home"),
+    "Announcements": ("Views.announcements", "show_announcements"),
+    "Profile": ("Views.profile", "show_profile"),
+    "Members": ("Views.members", "show_members"),
+    "Login": ("Views.login", "show_login"),
+    "SignUp": ("Views.signup", "show_signup"),
+}
+
+_loaded = {}
+
+# Seconds spent importing each view module, for startup profiling
+import_timings = {}
+
+
+def startup_profiling_enabled():
+    """Whether per-module import and init timings should be reported"""
+    try:
+        return bool(st.secrets.get("PROFILE_STARTUP", False))
+    except Exception:
+        return False
+
+
+def get_page(name):
+    """Return the render function for a page, importing its module on first use"""
+    page = _loaded.get(name)
+    if page is None:
+        module_name, function_name = PAGES[name]
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        import_timings[module_name] = time.perf_counter() - start
+        page = _loaded[name] = getattr(module, function_name)
+        if startup_profiling_enabled():
+            print(f"[startup] imported {module_name} in {import_timings[module_name] * 1000:.1f} ms")
+    return page
+
+
+def render_page(name):
+    """Render a registered page"""
+    init_before = set(firebase_config.init_timings)
+    get_page(name)()
+    if startup_profiling_enabled():
+        for client in set(firebase_config.init_timings) - init_before:
+            print(f"[startup] initialized {client} in {firebase_config.init_timings[client] * 1000:.1f} ms")
+
+
+def startup_report():
+    """Return (kind, name, milliseconds) rows for every import and client init so far"""
+    rows = [("import", module, seconds * 1000) for module, seconds in import_timings.items()]
+    rows += [("init", client, seconds * 1000) for client, seconds in firebase_config.init_timings.items()]
+    return rows
+
+
+def render_startup_report():
+    """Show the startup profile in the sidebar when profiling is enabled"""
+    if not startup_profiling_enabled():
+        return
+    with st.sidebar.expander("⏱️ Startup profile"):
+        for kind, name, milliseconds in startup_report():
+            st.caption(f"{kind} `{name}`: {milliseconds:.1f} ms")
@@ -0,0 +1,94 @@
+import time
+
+import streamlit as st
+
+from services.data_cache import document_key, get_document_cache
+from services.images import pick_profile_pic
+from services.local_mirror import get_local_mirror
+from services.write_queue import get_write_queue
+
+PROFILE_TTL_SECONDS = 300
+DEFAULT_AVATAR_URL = 'https://ui-avatars.com/api/?name=User&background=random'
+# Width avatars are rendered at next to comments
+AVATAR_WIDTH = 50
+
+
+def _identity_map():
+    """Return this session's uid -> (fetched_at, generation, profile) map"""
+    if 'profile_identity_map' not in st.session_state:
+        st.session_state.profile_identity_map = {}
+    return st.session_state.profile_identity_map
+
+
+def _is_fresh(entry, document_cache, user_id):
+    # An entry is stale once it expires or the shared cache saw a newer version
+    return (
+        entry is not None
+        and time.time() - entry[0] < PROFILE_TTL_SECONDS
+        and entry[1] == document_cache.generation(document_key("users", user_id))
+    )
+
+
+def get_profiles(firestore_db, user_ids):
+    """Resolve several user profiles, fetching the missing ones in one get_all call"""
+    identity_map = _identity_map()
+    document_cache = get_document_cache()
+    user_ids = {uid for uid in user_ids if uid}
+    missing = [uid for uid in user_ids if not _is_fresh(identity_map.get(uid), document_cache, uid)]
+
+    if missing:
+        now = time.time()
+        # The local mirror answers first, Firestore only for members it lacks
+        mirrored = get_local_mirror().get_many("users", missing)
+        for uid, profile in mirrored.items():
+            identity_map[uid] = (now, document_cache.generation(document_key("users", uid)), profile)
+        missing = [uid for uid in missing if uid not in mirrored]
+        for uid, profile in document_cache.get_many(firestore_db, "users", missing).items():
+            generation = document_cache.generation(document_key("users", uid))
+            identity_map[uid] = (now, generation, profile)
+
+    # Profile saves still in the write queue read as if they had committed
+    queue = get_write_queue()
+    profiles = {}
+    for uid in user_ids:
+        profile = queue.overlay(f"users/{uid}", identity_map[uid][2] if uid in identity_map else None)
+        if profile is not None:
+            profiles[uid] = profile
+    return profiles
+
+
+def get_profile(firestore_db, user_id):
+    """Resolve a single user profile through the identity map"""
+    if not user_id:
+        return {}
+    return get_profiles(firestore_db, [user_id]).get(user_id, {})
+
+
+def invalidate_profile(user_id):
+    """Drop a profile everywhere it is cached after it was written.
+
+    The local mirror keeps its row, so the member stays listed; the save
+    refreshes it once it commits.
+    """
+    _identity_map().pop(user_id, None)
+    get_document_cache().invalidate(document_key("users", user_id))
+
+
+def invalidate_all_profiles():
+    """Drop every cached profile for this session"""
+    _identity_map().clear()
+
+
+def display_name(profile, user=None, default="Anonymous"):
+    """Build a display name from a profile, falling back to the auth user"""
+    name = f"{profile.get('first_name', '')} {profile.get('last_name', '')}".strip()
+    if not name and user is not None:
+        name = f"{getattr(user, 'first_name', '')} {getattr(user, 'last_name', '')}".strip()
+    if not name and user is not None:
+        name = getattr(user, "email", "") or ""
+    return name or default
+
+
+def avatar_url(profile, default=DEFAULT_AVATAR_URL, width=AVATAR_WIDTH):
+    """Return the smallest profile picture variant that fits ``width``"""
+    return pick_profile_pic(profile, width, default=default)
@@ -0,0 +1,281 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+import jwt
+import requests
+import streamlit as st
+import streamlit.components.v1 as components
+from cryptography.x509 import load_pem_x509_certificate
+
+from configs.firebase_config import get_project_id
+from services.profiles import invalidate_all_profiles
+
+SESSION_COOKIE = "beerhaus_session"
+SESSION_LIFETIME = timedelta(days=5)
+
+# Certificates Google signs Firebase session cookies with
+PUBLIC_KEYS_URL = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/publicKeys"
+DEFAULT_KEYS_MAX_AGE_SECONDS = 3600
+# Keys are re-fetched in the background this long before they expire
+KEY_REFRESH_MARGIN_SECONDS = 600
+# An unknown key id forces a fetch at most this often
+UNKNOWN_KEY_RETRY_SECONDS = 60
+
+CLOCK_SKEW_SECONDS = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class SignInError(Exception):
+    """Email and password were rejected"""
+
+
+class InvalidSessionError(Exception):
+    """A session token failed verification"""
+
+
+class SessionUser:
+    """The signed-in user, restored from verified session claims"""
+
+    def __init__(self, uid, email=None):
+        self.uid = uid
+        self.email = email
+
+    def __repr__(self):
+        return f"SessionUser(uid={self.uid!r}, email={self.email!r})"
+
+
+def _secret(name, default=None):
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+def _emulator_host():
+    return os.environ.get("FIREBASE_AUTH_EMULATOR_HOST")
+
+
+def sessions_enabled():
+    """Whether password sign-in and session cookies are configured"""
+    return bool(_secret("FIREBASE_API_KEY") or _emulator_host())
+
+
+class PublicKeyStore:
+    """Session cookie signing keys, cached for as long as Google allows.
+
+    Keys are refreshed on a background thread shortly before they expire,
+    so verification only waits on the network for the very first fetch or
+    for a key id that has not been seen yet.
+    """
+
+    def __init__(self, url=PUBLIC_KEYS_URL):
+        self._url = url
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._expires_at = 0.0
+        self._refreshing = False
+        self._last_unknown_fetch = 0.0
+        self.fetches = 0
+
+    def _fetch(self):
+        response = requests.get(self._url, timeout=10)
+        response.raise_for_status()
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE_SECONDS
+        keys = {
+            kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+            for kid, pem in response.json().items()
+        }
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.time() + max_age
+            self.fetches += 1
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                self._fetch()
+            except Exception as e:
+                print(f"Session key refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name="session-key-refresh", daemon=True).start()
+
+    def get(self, kid):
+        """Return the public key for ``kid``, or None if Google does not list it"""
+        now = time.time()
+        with self._lock:
+            key = self._keys.get(kid)
+            expired = now >= self._expires_at
+            refresh_due = now >= self._expires_at - KEY_REFRESH_MARGIN_SECONDS
+            unknown = key is None and not expired and now - self._last_unknown_fetch >= UNKNOWN_KEY_RETRY_SECONDS
+            if unknown:
+                self._last_unknown_fetch = now
+            force = expired or unknown
+
+        if force:
+            self._fetch()
+            with self._lock:
+                return self._keys.get(kid)
+        if refresh_due:
+            self._refresh_in_background()
+        return key
+
+
+class SessionVerifier:
+    """Verifies Firebase session cookies locally against cached public keys"""
+
+    def __init__(self, project_id, key_store=None, emulated=False):
+        self._project_id = project_id
+        self._issuer = f"https://session.firebase.google.com/{project_id}"
+        self._key_store = key_store or PublicKeyStore()
+        self._emulated = emulated
+
+    def verify(self, token):
+        """Return the token's claims, raising InvalidSessionError if it is not valid"""
+        try:
+            if self._emulated:
+                # The Auth emulator issues unsigned tokens
+                claims = jwt.decode(
+                    token,
+                    options={"verify_signature": False, "verify_exp": True, "verify_aud": True, "verify_iss": True},
+                    audience=self._project_id,
+                    issuer=self._issuer,
+                    leeway=CLOCK_SKEW_SECONDS,
+                )
+            else:
+                header = jwt.get_unverified_header(token)
+                key = self._key_store.get(header.get("kid"))
+                if key is None:
+                    raise InvalidSessionError("Session is signed with an unknown key")
+                claims = jwt.decode(
+                    token,
+                    key,
+                    algorithms=["RS256"],
+                    audience=self._project_id,
+                    issuer=self._issuer,
+                    leeway=CLOCK_SKEW_SECONDS,
+                )
+        except jwt.PyJWTError as e:
+            raise InvalidSessionError(str(e)) from e
+        if not claims.get("sub"):
+            raise InvalidSessionError("Session has no subject")
+        return claims
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_verifier():
+    """Return the process-wide session verifier"""
+    return SessionVerifier(get_project_id(), emulated=bool(_emulator_host()))
+
+
+def sign_in_with_password(email, password):
+    """Check a password with Firebase Auth and return a short-lived ID token"""
+    emulator = _emulator_host()
+    base_url = f"http://{emulator}/identitytoolkit.googleapis.com" if emulator else "https://identitytoolkit.googleapis.com"
+    response = requests.post(
+        f"{base_url}/v1/accounts:signInWithPassword",
+        params={"key": _secret("FIREBASE_API_KEY", "emulator")},
+        json={"email": email, "password": password, "returnSecureToken": True},
+        timeout=10,
+    )
+    if response.status_code != 200:
+        try:
+            reason = response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            reason = response.text
+        raise SignInError(reason)
+    return response.json()["idToken"]
+
+
+def _write_cookie(value, max_age):
+    # Streamlit cannot set cookies itself, so the page sets it from an embedded script
+    components.html(
+        "<script>"
+        f"window.parent.document.cookie = {json.dumps(SESSION_COOKIE)} + '=' + {json.dumps(value)} + "
+        f"'; Max-Age={max_age}; Path=/; SameSite=Strict' + (window.parent.location.protocol === 'https:' ? '; Secure' : '');"
+        "</script>",
+        height=0,
+    )
+
+
+def _remember(token, claims):
+    st.session_state.user = SessionUser(claims["sub"], claims.get("email"))
+    st.session_state.is_authenticated = True
+    st.session_state.session_token = token
+    st.session_state.session_expires = claims["exp"]
+
+
+def start_session(auth, email, password):
+    """Sign in with email and password and keep the session in a browser cookie"""
+    id_token = sign_in_with_password(email, password)
+    token = auth.create_session_cookie(id_token, expires_in=SESSION_LIFETIME)
+    if isinstance(token, bytes):
+        token = token.decode("ascii")
+    claims = get_session_verifier().verify(token)
+    _remember(token, claims)
+    # Written on the next rerun, this one ends in st.rerun()
+    st.session_state.session_cookie_pending = (token, int(SESSION_LIFETIME.total_seconds()))
+    return st.session_state.user
+
+
+def end_session():
+    """Forget the session here and in the browser"""
+    token = st.session_state.pop('session_token', None)
+    if token:
+        # The handshake cookies of this connection still carry the token
+        st.session_state.session_token_ended = token
+        st.session_state.session_cookie_pending = ("", 0)
+    st.session_state.pop('session_expires', None)
+    st.session_state.is_authenticated = False
+    st.session_state.user = None
+    # Profiles resolved for this user must not show through for the next one in this browser
+    invalidate_all_profiles()
+
+
+def restore_session():
+    """Keep the session current; run at the top of every rerun.
+
+    A live session costs nothing. A new browser session verifies the
+    cookie locally once, against cached public keys.
+    """
+    pending = st.session_state.pop('session_cookie_pending', None)
+    if pending is not None:
+        _write_cookie(*pending)
+
+    if st.session_state.get('is_authenticated'):
+        expires = st.session_state.get('session_expires')
+        if expires is not None and time.time() >= expires:
+            end_session()
+        return
+
+    if not sessions_enabled():
+        return
+    token = st.context.cookies.get(SESSION_COOKIE)
+    if not token or token == st.session_state.get('session_token_ended'):
+        return
+    try:
+        claims = get_session_verifier().verify(token)
+    except InvalidSessionError:
+        st.session_state.session_token_ended = token
+        st.session_state.session_cookie_pending = ("", 0)
+        return
+    except Exception as e:
+        # Signing keys unreachable, the user can still sign in by hand
+        print(f"Session restore failed: {e}")
+        return
+    _remember(token, claims)
+    if st.session_state.get('current_page') in (None, "Login", "SignUp"):
+        st.session_state.current_page = "Home"
@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+from configs.firebase_config import get_storage
+from services.cache_backend import LocalBackend, get_cache_backend
+from services.single_flight import SingleFlight, get_single_flight
+
+SIGNED_URL_LIFETIME = timedelta(hours=1)
+# Re-sign a url once it is this close to expiring
+SIGNED_URL_REFRESH_MARGIN = timedelta(minutes=10)
+SIGNING_WORKERS = 8
+
+
+class SignedUrlManager:
+    """Signs Cloud Storage blob paths on demand and caches the results.
+
+    Urls are short-lived and re-signed shortly before they expire, so user
+    documents only ever need to store the blob path. Signed urls are
+    shared with the app's other processes through the cache backend, which
+    also lets browsers reuse a cached picture whichever replica served it.
+    """
+
+    NAMESPACE = "signed_urls"
+
+    def __init__(self, storage_bucket, lifetime=SIGNED_URL_LIFETIME,
+                 refresh_margin=SIGNED_URL_REFRESH_MARGIN, backend=None, single_flight=None):
+        self._storage_bucket = storage_bucket
+        self._lifetime = lifetime
+        self._refresh_margin = refresh_margin
+        self._backend = backend or LocalBackend()
+        self._single_flight = single_flight or SingleFlight()
+        self._lock = threading.Lock()
+        self._urls = {}  # path -> (url, expires_at)
+
+    def _sign(self, path):
+        expires_at = datetime.now(timezone.utc) + self._lifetime
+        url = self._storage_bucket.blob(path).generate_signed_url(expires_at, method='GET')
+        return url, expires_at
+
+    def _needs_signing(self, path):
+        entry = self._urls.get(path)
+        return entry is None or entry[1] - self._refresh_margin <= datetime.now(timezone.utc)
+
+    def get_urls(self, paths):
+        """Return path -> signed url, signing every missing or expiring path in one batch"""
+        paths = {path for path in paths if path}
+        self._forget(self._backend.invalidations(self.NAMESPACE))
+        with self._lock:
+            missing = [path for path in paths if self._needs_signing(path)]
+
+        if missing:
+            # Another process may have signed them already
+            shared = self._backend.get_many(self.NAMESPACE, missing)
+            with self._lock:
+                self._urls.update((path, tuple(entry)) for path, entry in shared.items())
+                missing = [path for path in missing if self._needs_signing(path)]
+
+        if missing:
+            # Paths another session is already signing are waited for, not signed twice
+            self._single_flight.do_many([(self.NAMESPACE, path) for path in missing], self._sign_batch)
+        with self._lock:
+            return {path: self._urls[path][0] for path in paths}
+
+    def _sign_batch(self, keys):
+        paths = [path for _, path in keys]
+        if len(paths) == 1:
+            signed = [self._sign(paths[0])]
+        else:
+            # Signing may be a remote IAM call, so sign a page of urls concurrently
+            with ThreadPoolExecutor(max_workers=min(SIGNING_WORKERS, len(paths))) as pool:
+                signed = list(pool.map(self._sign, paths))
+        # Shared only until other processes would want to re-sign them
+        self._backend.set_many(
+            self.NAMESPACE,
+            dict(zip(paths, signed)),
+            (self._lifetime - self._refresh_margin).total_seconds(),
+        )
+        with self._lock:
+            self._urls.update(zip(paths, signed))
+        return dict(zip(keys, signed))
+
+    def get_url(self, path):
+        """Return a signed url for a single blob path"""
+        if not path:
+            return None
+        return self.get_urls([path])[path]
+
+    def _forget(self, paths):
+        with self._lock:
+            for path in paths:
+                self._urls.pop(path, None)
+
+    def invalidate(self, paths):
+        """Forget signed urls for blobs that were replaced or deleted, in every process"""
+        paths = list(paths)
+        self._forget(paths)
+        self._backend.delete_many(self.NAMESPACE, paths)
+
+
+@st.cache_resource(show_spinner=False)
+def get_signed_url_manager():
+    """Return the process-wide signed url manager"""
+    return SignedUrlManager(get_storage(), backend=get_cache_backend(), single_flight=get_single_flight())
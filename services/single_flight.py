@@ -0,0 +1,110 @@
+import threading
+
+import streamlit as st
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent identical backend reads within the process.
+
+    The first caller for a key runs the read; callers arriving while it is
+    in flight wait for it and get the same result, or the same exception.
+    Nothing is cached once the read returns, so callers that arrive later
+    run their own read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in flight
+        self.enabled = True
+        self.stats = {"calls": 0, "shared": 0}
+
+    def _claim(self, key):
+        """Return (call, owner): a new call this thread runs, or one to wait for"""
+        call = self._calls.get(key)
+        if call is not None:
+            self.stats["shared"] += 1
+            return call, False
+        call = self._calls[key] = _Call()
+        self.stats["calls"] += 1
+        return call, True
+
+    def do(self, key, fn):
+        """Return ``fn()``, sharing one call among concurrent callers with the same key"""
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            call, owner = self._claim(key)
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_many(self, keys, fn):
+        """Return key -> value for ``keys``, fetching only those nobody is fetching yet.
+
+        ``fn(keys)`` fetches a batch and returns a dict; keys it leaves out
+        are missing. Keys already in flight are waited for instead.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled:
+            return fn(keys) if keys else {}
+        with self._lock:
+            claims = {key: self._claim(key) for key in keys}
+        owned = [key for key, (_, owner) in claims.items() if owner]
+
+        results = {}
+        if owned:
+            try:
+                fetched = fn(owned)
+                results.update(fetched)
+                for key in owned:
+                    claims[key][0].result = fetched.get(key)
+            except Exception as e:
+                for key in owned:
+                    claims[key][0].error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in owned:
+                        del self._calls[key]
+                for key in owned:
+                    claims[key][0].done.set()
+
+        for key, (call, owner) in claims.items():
+            if owner:
+                continue
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.result is not None:
+                results[key] = call.result
+        return results
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
+
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    """Return the process-wide single-flight group"""
+    return SingleFlight()
@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+TASK_WORKERS = 4
+# Jobs allowed to wait for a worker before new ones run on the caller's thread
+TASK_QUEUE_LIMIT = 32
+TASK_MAX_ATTEMPTS = 3
+TASK_RETRY_DELAY_SECONDS = 1.0
+
+
+class Job:
+    """Status of a background task, shared between the worker and the session"""
+
+    def __init__(self, description):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = "pending"
+        self.attempts = 0
+        self.error = None
+        self.result = None
+        self.reported = False
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+
+class TaskRunner:
+    """Bounded thread pool for side effects that should not block a rerun.
+
+    Failed tasks are retried with exponential backoff. When the queue is
+    full, tasks run on the caller's thread instead of piling up.
+    """
+
+    def __init__(self, workers=TASK_WORKERS, queue_limit=TASK_QUEUE_LIMIT):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="beerhaus-task")
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    def _run(self, job, fn, args, kwargs, max_attempts, retry_delay, release):
+        try:
+            job.status = "running"
+            for attempt in range(1, max_attempts + 1):
+                job.attempts = attempt
+                try:
+                    job.result = fn(*args, **kwargs)
+                    job.status = "succeeded"
+                    return
+                except Exception as e:
+                    job.error = str(e)
+                    if attempt < max_attempts:
+                        time.sleep(retry_delay * (2 ** (attempt - 1)))
+            job.status = "failed"
+            print(f"Background task failed: {job.description}: {job.error}")
+        finally:
+            if release:
+                self._slots.release()
+
+    def submit(self, description, fn, *args, max_attempts=TASK_MAX_ATTEMPTS,
+               retry_delay=TASK_RETRY_DELAY_SECONDS, **kwargs):
+        """Run ``fn`` in the background and return its Job"""
+        job = Job(description)
+        if self._slots.acquire(blocking=False):
+            self._executor.submit(self._run, job, fn, args, kwargs, max_attempts, retry_delay, True)
+        else:
+            self._run(job, fn, args, kwargs, max_attempts, retry_delay, False)
+        return job
+
+
+@st.cache_resource(show_spinner=False)
+def get_task_runner():
+    """Return the process-wide task runner"""
+    return TaskRunner()
+
+
+def submit_task(description, fn, *args, **kwargs):
+    """Run a task in the background and track its Job in this session"""
+    job = get_task_runner().submit(description, fn, *args, **kwargs)
+    if 'background_jobs' not in st.session_state:
+        st.session_state.background_jobs = {}
+    st.session_state.background_jobs[job.id] = job
+    return job
+
+
+def render_job_status():
+    """Show running jobs and surface finished ones once, on the next rerun"""
+    jobs = st.session_state.get('background_jobs', {})
+    for job_id, job in list(jobs.items()):
+        if not job.done:
+            st.info(f"⏳ {job.description}…")
+            continue
+        if not job.reported:
+            if job.status == "failed":
+                st.error(f"❌ {job.description} failed after {job.attempts} attempts: {job.error}")
+            else:
+                st.toast(f"✅ {job.description} finished")
+            job.reported = True
+        del jobs[job_id]
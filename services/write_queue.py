@@ -0,0 +1,616 @@
+import copy
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime
+
+import streamlit as st
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud.firestore_v1 import DELETE_FIELD, ArrayUnion, Increment
+
+from services.tasks import Job
+
+DEFAULT_QUEUE_PATH = os.path.join(".cache", "write_queue.sqlite3")
+MAX_BATCH_OPS = 500
+WRITE_MAX_ATTEMPTS = 8
+WRITE_RETRY_DELAY_SECONDS = 0.5
+# A claimed write is handed to another worker if not committed by then
+LEASE_SECONDS = 60
+IDLE_POLL_SECONDS = 1.0
+# A process that has not renewed its heartbeat for this long is gone; its writes are adopted
+OWNER_TIMEOUT_SECONDS = 30
+HEARTBEAT_SECONDS = 5
+# A committed write's key is remembered this long, so replaying it does not write again
+COMMITTED_KEY_SECONDS = 24 * 3600
+
+RETRYABLE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.ServiceUnavailable,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.InternalServerError,
+)
+
+
+def encode_value(value):
+    """Make a Firestore value JSON-safe, keeping sentinels, transforms and datetimes"""
+    if value is DELETE_FIELD:
+        return {"$delete": True}
+    if isinstance(value, Increment):
+        return {"$increment": value.value}
+    if isinstance(value, ArrayUnion):
+        return {"$array_union": [encode_value(v) for v in value.values]}
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, dict):
+        return {key: encode_value(v) for key, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(v) for v in value]
+    return value
+
+
+def decode_value(value):
+    """Inverse of ``encode_value``"""
+    if isinstance(value, dict):
+        if "$delete" in value:
+            return DELETE_FIELD
+        if "$increment" in value:
+            return Increment(value["$increment"])
+        if "$array_union" in value:
+            return ArrayUnion([decode_value(v) for v in value["$array_union"]])
+        if "$datetime" in value:
+            return datetime.fromisoformat(value["$datetime"])
+        if "$date" in value:
+            return date.fromisoformat(value["$date"])
+        return {key: decode_value(v) for key, v in value.items()}
+    if isinstance(value, list):
+        return [decode_value(v) for v in value]
+    return value
+
+
+def _split(field_path):
+    # Segments that are not plain identifiers arrive quoted in backticks
+    return [part.strip("`") for part in field_path.split(".")]
+
+
+def _apply_field(data, field_path, value):
+    """Apply one field write to a local copy of a document"""
+    parts = _split(field_path)
+    parent = data
+    for part in parts[:-1]:
+        if not isinstance(parent.get(part), dict):
+            parent[part] = {}
+        parent = parent[part]
+    name = parts[-1]
+    if value is DELETE_FIELD:
+        parent.pop(name, None)
+    elif isinstance(value, Increment):
+        parent[name] = (parent.get(name) or 0) + value.value
+    elif isinstance(value, ArrayUnion):
+        current = list(parent.get(name) or [])
+        current.extend(v for v in value.values if v not in current)
+        parent[name] = current
+    else:
+        parent[name] = copy.deepcopy(value)
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            _apply_field(target, key, value)
+
+
+def _apply_op(document, op):
+    """Return ``document`` as it will read once ``op`` is committed"""
+    kind, _, data, merge = op
+    if kind == "delete":
+        return None
+    if kind == "create" or (kind == "set" and not merge):
+        result = {}
+        for key, value in data.items():
+            _apply_field(result, key, value)
+        return result
+    result = copy.deepcopy(document) if document else {}
+    if kind == "set":
+        _merge(result, data)
+    else:
+        for field_path, value in data.items():
+            _apply_field(result, field_path, value)
+    return result
+
+
+_COMMIT_ACTIONS = {}  # name -> callable run with an action's arguments once its write commits
+
+
+def commit_action(name):
+    """Register a function that runs, in whichever process commits it, after a write listing it.
+
+    Actions are stored with the write rather than held in memory, so
+    they survive a restart and run for writes adopted from a process
+    that stopped before committing them.
+    """
+    def register(fn):
+        _COMMIT_ACTIONS[name] = fn
+        return fn
+    return register
+
+
+def _run_actions(key, actions):
+    for name, args in actions:
+        action = _COMMIT_ACTIONS.get(name)
+        if action is None:
+            print(f"Queued write {key} has no commit action {name!r}")
+            continue
+        try:
+            action(*args)
+        except Exception as e:
+            print(f"Commit action {name} of {key} failed: {e}")
+
+
+def create_op(path, data):
+    return ("create", path, data, False)
+
+
+def set_op(path, data, merge=False):
+    return ("set", path, data, merge)
+
+
+def update_op(path, data):
+    return ("update", path, data, False)
+
+
+class WriteQueue:
+    """Durable write-behind queue in front of Firestore.
+
+    Each enqueued write is a list of operations that must commit together.
+    Writes are stored in SQLite before ``enqueue`` returns, then a
+    background worker commits them in WriteBatches of up to 500
+    operations, retrying failures with jittered exponential backoff.
+    Until a write commits, views read it through ``overlay`` and
+    ``pending_in``.
+
+    The queue file may be shared by several processes on a host. Each
+    process only commits and overlays the writes it enqueued, so its
+    overlay stays consistent with what it committed. Writes of a process whose heartbeat stopped are adopted
+    by the next live one.
+    """
+
+    def __init__(self, path, firestore_factory, max_batch_ops=MAX_BATCH_OPS,
+                 max_attempts=WRITE_MAX_ATTEMPTS, retry_delay=WRITE_RETRY_DELAY_SECONDS):
+        self._firestore_factory = firestore_factory
+        self._max_batch_ops = max_batch_ops
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._owner = uuid.uuid4().hex
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._jobs = {}  # write key -> Job, for unfinished writes enqueued by this process
+        self._foreign = set()  # keys of those jobs whose write another process owns
+        self._pending = {}  # document path -> [(id, op)] awaiting commit
+        self.stats = {"enqueued": 0, "committed": 0, "batches": 0, "retries": 0, "failed": 0, "adopted": 0}
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS writes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT UNIQUE NOT NULL,
+                description TEXT,
+                ops TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                leased_by TEXT,
+                leased_until REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                owner TEXT,
+                actions TEXT,
+                finished_at REAL
+            )
+        """)
+        # Queue files written before writes had owners, actions and tombstones
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(writes)")}
+        for column, column_type in (("owner", "TEXT"), ("actions", "TEXT"), ("finished_at", "REAL")):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE writes ADD COLUMN {column} {column_type}")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS owners (
+                owner TEXT PRIMARY KEY,
+                alive_until REAL NOT NULL
+            )
+        """)
+        self._last_heartbeat = 0.0
+        self._heartbeat()
+        self._adopt()
+
+    def _heartbeat(self):
+        """Tell the other processes this one is still committing its writes; True when renewed"""
+        now = time.time()
+        if now - self._last_heartbeat < HEARTBEAT_SECONDS:
+            return False
+        self._last_heartbeat = now
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO owners VALUES (?, ?)", (self._owner, now + OWNER_TIMEOUT_SECONDS)
+            )
+        return True
+
+    def _adopt(self):
+        """Take over pending writes of processes that stopped, and overlay them from now on"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM owners WHERE alive_until <= ?", (now,))
+                rows = self._db.execute(
+                    "SELECT id, ops FROM writes WHERE status = 'pending' AND leased_until <= ? "
+                    "AND (owner IS NULL OR owner NOT IN (SELECT owner FROM owners)) ORDER BY id",
+                    (now,),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE writes SET owner = ? WHERE id = ?", [(self._owner, write_id) for write_id, _ in rows]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            for write_id, ops in rows:
+                self._remember(write_id, [tuple(op) for op in decode_value(json.loads(ops))])
+            self.stats["adopted"] += len(rows)
+
+    def _prune(self):
+        """Forget committed keys once a replay of them is no longer expected"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM writes WHERE status = 'committed' AND finished_at <= ?",
+                (time.time() - COMMITTED_KEY_SECONDS,),
+            )
+
+    def _follow_foreign_jobs(self):
+        """Report jobs whose write another process owns once it finishes there"""
+        with self._lock:
+            if not self._foreign:
+                return
+            keys = list(self._foreign)
+            rows = {}
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows.update(
+                    (row[0], row[1:]) for row in self._db.execute(
+                        f"SELECT key, status, attempts, last_error, owner FROM writes "
+                        f"WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    )
+                )
+            for key in keys:
+                job = self._jobs[key]
+                status, attempts, error, owner = rows.get(key, ("committed", job.attempts, None, None))
+                if status == "pending" and owner == self._owner:
+                    # Adopted, this process reports it when it commits
+                    self._foreign.discard(key)
+                    continue
+                job.attempts, job.error = attempts, error
+                if status == "pending":
+                    continue
+                job.status = "succeeded" if status == "committed" else "failed"
+                self._foreign.discard(key)
+                del self._jobs[key]
+
+    def _remember(self, write_id, ops):
+        for op in ops:
+            self._pending.setdefault(op[1], []).append((write_id, op))
+
+    def _forget(self, write_id, ops):
+        for op in ops:
+            remaining = [entry for entry in self._pending.get(op[1], []) if entry[0] != write_id]
+            if remaining:
+                self._pending[op[1]] = remaining
+            else:
+                self._pending.pop(op[1], None)
+
+    def enqueue(self, ops, description="Saving", key=None, actions=()):
+        """Durably queue operations that commit together and return their Job.
+
+        ``key`` makes the write idempotent: enqueuing a key that is pending,
+        failed, or committed within ``COMMITTED_KEY_SECONDS`` returns a job
+        reporting that write instead of writing twice.
+        ``actions`` are ``(name, args)`` pairs of registered commit actions
+        run after the write commits.
+        """
+        key = key or uuid.uuid4().hex
+        with self._lock:
+            if key in self._jobs:
+                return self._jobs[key]
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO writes (key, description, ops, created_at, owner, actions) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key, description, json.dumps(encode_value([list(op) for op in ops])), time.time(), self._owner,
+                    json.dumps(encode_value([[name, list(args)] for name, args in actions])),
+                ),
+            )
+            job = Job(description)
+            if cursor.rowcount:
+                self._jobs[key] = job
+                self._remember(cursor.lastrowid, ops)
+                self.stats["enqueued"] += 1
+            else:
+                # Written before, possibly by another process or an earlier run
+                status, job.attempts, job.error, owner = self._db.execute(
+                    "SELECT status, attempts, last_error, owner FROM writes WHERE key = ?", (key,)
+                ).fetchone()
+                if status == "committed":
+                    job.status = "succeeded"
+                elif status == "failed":
+                    job.status = "failed"
+                else:
+                    self._jobs[key] = job
+                    if owner != self._owner:
+                        self._foreign.add(key)
+        self._wake.set()
+        return job
+
+    def overlay(self, path, document):
+        """Return ``document`` with this path's queued writes applied"""
+        with self._lock:
+            entries = list(self._pending.get(path, ()))
+        for _, op in entries:
+            document = _apply_op(document, op)
+        return document
+
+    def pending_in(self, collection_path):
+        """Return id -> document for queued creates directly under a collection"""
+        prefix = collection_path.rstrip("/") + "/"
+        with self._lock:
+            paths = [
+                path for path, entries in self._pending.items()
+                if path.startswith(prefix) and "/" not in path[len(prefix):] and entries[0][1][0] == "create"
+            ]
+        return {path[len(prefix):]: self.overlay(path, None) for path in paths}
+
+    def pending_writes(self, collection_path):
+        """Return the ids of queued writes touching documents under a collection"""
+        prefix = collection_path.rstrip("/") + "/"
+        with self._lock:
+            return frozenset(
+                write_id
+                for path, entries in self._pending.items() if path.startswith(prefix)
+                for write_id, _ in entries
+            )
+
+    def _claim(self):
+        """Lease this process's oldest due writes, up to one batch worth of operations"""
+        now = time.time()
+        with self._lock:
+            # The write lock is taken up front, so no other process leases between the read and the update
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT id, key, ops, attempts, actions FROM writes "
+                    "WHERE owner = ? AND status = 'pending' AND next_attempt_at <= ? AND leased_until <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (self._owner, now, now, self._max_batch_ops),
+                ).fetchall()
+                claimed, op_count = [], 0
+                for write_id, key, ops, attempts, actions in rows:
+                    ops = [tuple(op) for op in decode_value(json.loads(ops))]
+                    if claimed and op_count + len(ops) > self._max_batch_ops:
+                        break
+                    leased = self._db.execute(
+                        "UPDATE writes SET leased_by = ?, leased_until = ? "
+                        "WHERE id = ? AND owner = ? AND status = 'pending' AND leased_until <= ?",
+                        (self._owner, now + LEASE_SECONDS, write_id, self._owner, now),
+                    ).rowcount
+                    if not leased:
+                        continue
+                    actions = decode_value(json.loads(actions)) if actions else []
+                    claimed.append((write_id, key, ops, attempts, actions))
+                    op_count += len(ops)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def _commit(self, firestore_db, writes):
+        batch = firestore_db.batch()
+        for _, _, ops, _, _ in writes:
+            for kind, path, data, merge in ops:
+                reference = firestore_db.document(path)
+                if kind == "create":
+                    batch.create(reference, data)
+                elif kind == "set":
+                    batch.set(reference, data, merge=merge)
+                elif kind == "update":
+                    batch.update(reference, data)
+                else:
+                    batch.delete(reference)
+        batch.commit()
+        self.stats["batches"] += 1
+
+    def _finish(self, writes, error=None, retryable=True):
+        now = time.time()
+        done = []
+        with self._lock:
+            for write_id, key, ops, attempts, actions in writes:
+                job = self._jobs.get(key)
+                if error is None:
+                    # The key stays behind as a tombstone, so a replay is recognised
+                    self._db.execute(
+                        "UPDATE writes SET status = 'committed', ops = '[]', actions = NULL, leased_until = 0, "
+                        "finished_at = ? WHERE id = ?",
+                        (now, write_id),
+                    )
+                    self._forget(write_id, ops)
+                    self._jobs.pop(key, None)
+                    self.stats["committed"] += 1
+                    if job is not None:
+                        job.status = "succeeded"
+                    done.append((key, actions))
+                elif retryable and attempts + 1 < self._max_attempts:
+                    delay = self._retry_delay * (2 ** attempts) * (1 + random.random())
+                    self._db.execute(
+                        "UPDATE writes SET attempts = ?, next_attempt_at = ?, leased_until = 0, last_error = ? "
+                        "WHERE id = ?",
+                        (attempts + 1, now + delay, str(error), write_id),
+                    )
+                    self.stats["retries"] += 1
+                    if job is not None:
+                        job.attempts = attempts + 1
+                        job.error = str(error)
+                else:
+                    # Kept for inspection, but no longer shown as if it were saved
+                    self._db.execute(
+                        "UPDATE writes SET status = 'failed', attempts = ?, leased_until = 0, last_error = ? "
+                        "WHERE id = ?",
+                        (attempts + 1, str(error), write_id),
+                    )
+                    self._forget(write_id, ops)
+                    self._jobs.pop(key, None)
+                    self.stats["failed"] += 1
+                    print(f"Queued write {key} failed: {error}")
+                    if job is not None:
+                        job.attempts = attempts + 1
+                        job.error = str(error)
+                        job.status = "failed"
+        for key, actions in done:
+            _run_actions(key, actions)
+
+    def flush(self):
+        """Commit one batch of due writes; returns how many were claimed"""
+        writes = self._claim()
+        if not writes:
+            return 0
+        firestore_db = self._firestore_factory()
+        try:
+            self._commit(firestore_db, writes)
+            self._finish(writes)
+        except gcp_exceptions.AlreadyExists:
+            # A create in one write already landed, likely a retried batch that
+            # did commit; commit the writes one by one to find it
+            for write in writes:
+                try:
+                    self._commit(firestore_db, [write])
+                    self._finish([write])
+                except gcp_exceptions.AlreadyExists:
+                    self._finish([write])
+                except RETRYABLE_ERRORS as e:
+                    self._finish([write], e)
+                except Exception as e:
+                    self._finish([write], e, retryable=False)
+        except RETRYABLE_ERRORS as e:
+            self._finish(writes, e)
+        except Exception as e:
+            if len(writes) == 1:
+                self._finish(writes, e, retryable=False)
+            else:
+                # Isolate the bad write so the others still commit
+                for write in writes:
+                    try:
+                        self._commit(firestore_db, [write])
+                        self._finish([write])
+                    except RETRYABLE_ERRORS as e:
+                        self._finish([write], e)
+                    except Exception as e:
+                        self._finish([write], e, retryable=False)
+        return len(writes)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self._heartbeat():
+                    self._adopt()
+                    self._prune()
+                self._follow_foreign_jobs()
+                if self.flush():
+                    continue
+            except Exception as e:
+                print(f"Write queue flush failed: {e}")
+            self._wake.wait(IDLE_POLL_SECONDS)
+            self._wake.clear()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="beerhaus-write-queue", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def drain(self, timeout=30):
+        """Block until nothing is pending; for scripts and benchmarks"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return True
+            self._wake.set()
+            time.sleep(0.01)
+        return False
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, pending_documents=len(self._pending))
+
+
+def read_pending_ops(path):
+    """Return the operations of every pending write in a queue file, whichever process owns them.
+
+    The file is opened read-only, so scripts can inspect the queue of a
+    running app; a missing file has no pending writes.
+    """
+    if not os.path.exists(path):
+        return []
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=10)
+    try:
+        rows = db.execute("SELECT ops FROM writes WHERE status = 'pending'").fetchall()
+    finally:
+        db.close()
+    return [tuple(op) for (ops,) in rows for op in decode_value(json.loads(ops))]
+
+
+def queue_path():
+    """Return the write queue file this host's app processes share"""
+    try:
+        return st.secrets.get("WRITE_QUEUE_PATH", DEFAULT_QUEUE_PATH)
+    except Exception:
+        return DEFAULT_QUEUE_PATH
+
+
+@st.cache_resource(show_spinner=False)
+def get_write_queue():
+    """Return the process-wide write queue, with its worker running"""
+    from configs.firebase_config import get_firestore
+    # Adopted writes may list their actions before any view imported them
+    import services.data_cache  # noqa: F401
+    import services.images  # noqa: F401
+    import services.local_mirror  # noqa: F401
+    return WriteQueue(queue_path(), get_firestore).start()
+
+
+def queue_write(ops, description, key=None, actions=()):
+    """Queue a write and track its Job in this session like a background task"""
+    job = get_write_queue().enqueue(ops, description, key=key, actions=actions)
+    if 'background_jobs' not in st.session_state:
+        st.session_state.background_jobs = {}
+    st.session_state.background_jobs[job.id] = job
+    return job